@@ -7,35 +7,30 @@ except ImportError:
     PYPERCLIP_AVAILABLE = False
 
 import streamlit as st
-import os
-import tempfile
-from utils.file_utils import process_uploaded_file, export_to_excel, export_test_cases_to_excel
-from utils.text_processing import generate_wordcloud, clean_text
+from utils.file_utils import extract_document, extract_checkpoints
+from utils.checkpoint_utils import checkpoint_store
+from utils.export_utils import EXPORT_FORMATS, MIME_TYPES, build_export, get_export
+from utils.text_processing import analyze_text, wordcloud_image, text_fingerprint
+from utils.text_processing import DEFAULT_SEMANTIC_THRESHOLD, SemanticIndex, semantic_deduplicate
+from utils.cache_utils import ResponseCache
+from utils.project_utils import ProjectStore, lineage_rows
+from utils.diff_utils import regenerate_incrementally, merge_index, chunk_fingerprint
+from utils.testcase_utils import parse_test_cases
+from utils.section_utils import index_sections, section_label, generate_by_section, merge_sections
+from utils.chunk_utils import chunk_text
+from utils.job_utils import JobRegistry, run_stream, DONE, FAILED, PENDING
+from utils.pipeline_utils import run_pipeline, flatten_results
 from utils.openai_utils import (
-    split_text,
-    generate_rules, 
-    generate_checkpoints, 
-    generate_test_cases
+    DEFAULT_MAX_WORKERS,
+    AzureOpenAIClient,
+    stream_rules,
+    stream_checkpoints,
+    stream_test_cases
 )
 from utils.text_processing import is_similar
-from collections import Counter
-import io
-from docx import Document
-import re 
 from difflib import SequenceMatcher
-from datetime import datetime
-import PyPDF2
-from tqdm import tqdm
-
-import spacy
-import subprocess
-
-# Télécharger automatiquement le modèle si pas présent
-try:
-    nlp = spacy.load("fr_core_news_sm")
-except:
-    subprocess.run(["python", "-m", "spacy", "download", "fr_core_news_sm"])
-    nlp = spacy.load("fr_core_news_sm")
+import time
+import uuid
 
 
 def is_similar(text1: str, text2: str, threshold: float = 0.85) -> bool:
@@ -101,6 +96,244 @@ def show_progress(current, total, message):
         progress_bar.empty()
         st.toast(f"Tâche terminée : {message}", icon="✅")
 
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Cache disque des réponses LLM, partagé par tous les clients du serveur."""
+    return ResponseCache()
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key, endpoint, model):
+    """Client Azure OpenAI partagé entre les reruns et les sessions (connexions persistantes)."""
+    return AzureOpenAIClient(api_key, endpoint, model, cache=get_response_cache())
+
+def current_openai_client():
+    """Client correspondant aux paramètres saisis dans la barre latérale."""
+    return get_openai_client(
+        st.session_state.openai_key,
+        st.session_state.openai_endpoint,
+        st.session_state.model_name
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_job_registry():
+    """Registre des tâches de génération en arrière-plan, partagé par toutes les sessions."""
+    return JobRegistry()
+
+@st.cache_resource(show_spinner=False)
+def get_project_store():
+    """Base des projets enregistrés (documents et résultats), partagée par toutes les sessions."""
+    return ProjectStore()
+
+# Résultats de session enregistrés dans le projet du document, avec leur valeur par défaut
+PROJECT_STATE = {
+    "rules": list, "checkpoints": list, "existing_checkpoints": list, "test_cases": list,
+    "spec_index": dict, "chunk_results": dict, "section_results": dict, "item_sections": dict
+}
+# Résultats par bloc : origine dans la base des projets -> (clé de session, nature du bloc)
+PROJECT_BLOCKS = {"spec": ("spec_index", "chunk"), "pipeline": ("chunk_results", "chunk"),
+                  "section": ("section_results", "section")}
+# Libellé des éléments en échec de chaque étape
+FAILURE_LABELS = {"rules": "chunks", "checkpoints": "lots", "test_cases": "lots de points de contrôle",
+                  "pipeline": "requêtes", "incremental": "éléments", "sections": "requêtes"}
+
+def project_state():
+    """Copie des résultats de la session, capturée à la soumission d'une tâche."""
+    return {key: st.session_state.get(key) or default() for key, default in PROJECT_STATE.items()}
+
+def project_updates(stage, result, state, sections):
+    """
+    Résultats de session modifiés par une tâche terminée, et message de fin.
+
+    N'accède pas à la session : appelée dans le thread de la tâche, à partir de
+    l'état et des sections capturés à sa soumission.
+    """
+    existing_points = state["existing_checkpoints"]
+    if stage == "rules":
+        return {"rules": result}, f"{len(result)} règles générées avec succès !"
+    if stage == "checkpoints":
+        final_points = remove_duplicates(result, existing_points)
+        return {"checkpoints": existing_points + final_points}, f"{len(final_points)} points de contrôle générés !"
+    if stage == "test_cases":
+        test_cases = parse_test_cases(result)
+        return {"test_cases": test_cases}, f"{len(test_cases)} cas de test générés !"
+
+    if stage == "pipeline":
+        merged = flatten_results(list(result.values()))
+        updates = {"chunk_results": result}
+    elif stage == "incremental":
+        index, order, provenance = result
+        merged = merge_index(index, order)
+        updates = {"spec_index": index, "spec_provenance": provenance}
+        regenerated = sum(1 for p in provenance if p["statut"] == "nouveau/modifié")
+        message = f"{regenerated} chunks régénérés, {len(order) - regenerated} réutilisés."
+    else:
+        section_results, failed = result
+        merged, origins = merge_sections(section_results, sections)
+        updates = {"section_results": section_results, "item_sections": origins}
+        message = f"{len(section_results)} sections traitées ({len(failed)} en échec)."
+    updates.update(
+        rules=merged["rules"],
+        checkpoints=existing_points + remove_duplicates(merged["checkpoints"], existing_points),
+        test_cases=parse_test_cases(merged["test_cases"])
+    )
+    if stage == "pipeline":
+        message = (f"{len(updates['rules'])} règles, {len(updates['checkpoints'])} points de contrôle "
+                   f"et {len(updates['test_cases'])} cas de test générés !")
+    return updates, message
+
+def save_project(store, document_id, state, updates):
+    """
+    Enregistre dans le projet les résultats modifiés par une tâche, avec la filiation
+    chunk/section -> règle -> point de contrôle -> cas de test de ses résultats par bloc.
+    """
+    state = {**state, **updates}
+    chunks = {source: state[key] for source, (key, _) in PROJECT_BLOCKS.items() if key in updates}
+    lineage = None
+    if chunks:
+        lineage = list(lineage_rows(
+            (block_kind, block, entry)
+            for key, block_kind in PROJECT_BLOCKS.values()
+            for block, entry in state[key].items()
+        ))
+    store.save_results(
+        document_id,
+        rules=updates.get("rules"),
+        checkpoints=updates.get("checkpoints"),
+        test_cases=[case.markdown for case in updates["test_cases"]] if "test_cases" in updates else None,
+        existing=state["existing_checkpoints"],
+        chunks=chunks,
+        lineage=lineage
+    )
+
+def load_project(document_id):
+    """Recharge dans la session les résultats enregistrés d'un projet."""
+    store = get_project_store()
+    st.session_state.rules = store.load_items(document_id, "rules")
+    st.session_state.checkpoints = store.load_items(document_id, "checkpoints")
+    st.session_state.existing_checkpoints = store.load_items(document_id, "checkpoints", existing=True)
+    st.session_state.test_cases = parse_test_cases(store.iter_items(document_id, "test_cases"))
+    for source, (key, _) in PROJECT_BLOCKS.items():
+        st.session_state[key] = store.load_chunks(document_id, source)
+    _, st.session_state.item_sections = merge_sections(st.session_state.section_results, st.session_state.sections)
+    st.session_state.spec_provenance = []
+
+def reset_results():
+    """Vide les résultats de la session (nouveau document). L'index par chunk est conservé :
+    la génération incrémentale reprend les chunks inchangés de la version précédente."""
+    for key, default in PROJECT_STATE.items():
+        if key not in ("spec_index", "existing_checkpoints"):
+            st.session_state[key] = default()
+    st.session_state.spec_provenance = []
+
+def open_project(document_id):
+    """Ouvre un projet enregistré sans téléverser à nouveau le document."""
+    document = get_project_store().get_document(document_id)
+    st.session_state.document_id = document.id
+    st.session_state.text = document.text
+    st.session_state.sections = index_sections(document.text, document.page_offsets, document.headings)
+    load_project(document_id)
+
+# Intervalle de rafraîchissement de l'interface pendant qu'une tâche tourne (secondes)
+JOB_POLL_INTERVAL = 1.0
+
+def submit_job(stage, target):
+    """
+    Lance une étape de génération en arrière-plan pour la session courante.
+
+    Le document, ses sections et les résultats de la session sont capturés à la
+    soumission : la tâche calcule elle-même les résultats mis à jour et les enregistre
+    dans le projet, si bien qu'un rafraîchissement de la page pendant la génération ne
+    les perd pas et qu'un changement de document ne les mélange pas.
+    """
+    document_id, sections, state = st.session_state.document_id, st.session_state.sections, project_state()
+    store = get_project_store()
+
+    def run(job):
+        updates, message = project_updates(stage, target(job), state, sections)
+        if document_id and not job.cancelled:
+            save_project(store, document_id, state, updates)
+        return document_id, updates, message
+
+    return get_job_registry().submit(st.session_state.session_id, stage, run)
+
+def render_job(stage, message, format_item, latest=20):
+    """Affiche la progression et les derniers résultats partiels d'une tâche en cours."""
+    registry = get_job_registry()
+    job = registry.latest(st.session_state.session_id, stage)
+    if job is None or not job.active:
+        return
+    if job.status == PENDING:
+        # Toutes les places d'exécution du serveur sont occupées
+        st.info(f"Tâche en attente : {registry.waiting_before(job)} tâche(s) avant elle dans la file.")
+        if st.button("Annuler", key=f"cancel_job_{stage}"):
+            job.cancel()
+        return
+    progress = job.done / job.total if job.total else 0
+    label = job.message or message
+    st.progress(progress, text=f"{int(progress * 100)}% - {label} {job.done}/{job.total} • {job.count} éléments reçus")
+    with st.container(height=300):
+        for item in job.latest(latest):
+            st.markdown(format_item(item))
+    if st.button("Annuler", key=f"cancel_job_{stage}"):
+        job.cancel()
+
+def apply_finished_jobs():
+    """Reporte dans la session les résultats des tâches terminées depuis le dernier rerun."""
+    for job in get_job_registry().jobs_for(st.session_state.session_id):
+        if job.applied or job.active:
+            continue
+        job.applied = True
+        if job.status == FAILED:
+            st.error(f"Erreur lors de la génération : {str(job.error)}")
+            continue
+        if job.status != DONE:
+            continue
+
+        document_id, updates, message = job.result
+        if document_id != st.session_state.document_id:
+            # Tâche lancée sur un autre document : ses résultats sont dans le projet de celui-ci
+            st.info("Une génération lancée sur un autre document est terminée : "
+                    "ses résultats ont été enregistrés dans son projet.")
+            continue
+        for key, value in updates.items():
+            st.session_state[key] = value
+        report_failures(job.errors, FAILURE_LABELS[job.stage])
+        st.success(message)
+
+def current_checkpoint_filter():
+    """Filtre des paraphrases avant les cas de test si la déduplication sémantique est activée."""
+    if not st.session_state.semantic_dedup:
+        return None
+    return SemanticIndex(st.session_state.semantic_threshold).filter_new
+
+def report_failures(errors, message):
+    """Affiche le nombre d'éléments en échec lors d'une génération."""
+    if errors:
+        st.warning(f"{len(errors)} {message} en échec : {errors[0]}")
+
+def render_export(kind, items, file_stem, key, radio_key, existing=()):
+    """
+    Choix du format et téléchargement d'un export. Le fichier n'est construit qu'à
+    la demande, puis réutilisé tant que le contenu ne change pas.
+    """
+    export_format = st.radio("Format d'export", list(EXPORT_FORMATS), horizontal=True, key=radio_key)
+    fmt = EXPORT_FORMATS[export_format]
+    data = get_export(kind, fmt, items, existing)
+    if data is None and st.button(f"Préparer l'export {export_format}", key=f"prepare_{key}_{fmt}"):
+        try:
+            with st.spinner("Préparation du fichier..."):
+                data = build_export(kind, fmt, items, existing)
+        except Exception as e:
+            st.error(f"Erreur {fmt.upper()} : {str(e)}")
+    if data is not None:
+        st.download_button(
+            label=f"Télécharger (.{fmt})",
+            data=data,
+            file_name=f"{file_stem}.{fmt}",
+            mime=MIME_TYPES[fmt],
+            key=f"download_{key}_{fmt}"
+        )
+
 def main():
     st.title("Génération automatique des cas de tests")
     st.markdown("""
@@ -119,6 +352,24 @@ def main():
         st.session_state.checkpoints = []
     if 'test_cases' not in st.session_state:
         st.session_state.test_cases = []
+    if 'spec_index' not in st.session_state:
+        st.session_state.spec_index = {}
+    if 'sections' not in st.session_state:
+        st.session_state.sections = []
+    if 'section_results' not in st.session_state:
+        st.session_state.section_results = {}
+    if 'item_sections' not in st.session_state:
+        st.session_state.item_sections = {}
+    if 'chunk_results' not in st.session_state:
+        st.session_state.chunk_results = {}
+    if 'document_id' not in st.session_state:
+        st.session_state.document_id = None
+    if 'upload_id' not in st.session_state:
+        st.session_state.upload_id = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+    apply_finished_jobs()
 
     # Sidebar pour les paramètres
     with st.sidebar:
@@ -126,30 +377,192 @@ def main():
         st.session_state.openai_key = st.text_input("Clé API OpenAI", type="password")
         st.session_state.openai_endpoint = st.text_input("Endpoint Azure OpenAI", "https://chat-genai.openai.azure.com/")
         st.session_state.model_name = st.selectbox("Modèle", ["gpt-4o", "gpt-35-turbo"])
+        st.session_state.max_workers = st.slider("Requêtes simultanées", 1, 32, DEFAULT_MAX_WORKERS)
+        st.session_state.test_batch_size = st.slider("Points de contrôle par requête (cas de test)", 1, 10, 5)
+        st.session_state.semantic_dedup = st.checkbox(
+            "Déduplication sémantique avant les cas de test",
+            help="Regroupe les points de contrôle paraphrasés pour ne générer qu'un cas de test par groupe."
+        )
+        st.session_state.semantic_threshold = st.slider(
+            "Seuil de similarité sémantique", 0.80, 0.99, DEFAULT_SEMANTIC_THRESHOLD, 0.01,
+            disabled=not st.session_state.semantic_dedup
+        )
         
         st.divider()
         st.info("Configurez votre clé API et endpoint avant de commencer.")
 
+        cache_stats = get_response_cache().stats()
+        st.caption(
+            f"Cache LLM : {cache_stats['hits']} réponses réutilisées • {cache_stats['misses']} appels • "
+            f"{cache_stats['entries']} entrées ({cache_stats['bytes'] / 1_048_576:.1f} Mo)"
+        )
+        if st.button("Vider le cache", key="clear_llm_cache"):
+            get_response_cache().clear()
+
+        projects = get_project_store().projects()
+        if projects:
+            st.divider()
+            project = st.selectbox(
+                "Projets enregistrés", projects,
+                format_func=lambda p: f"{p.name} ({p.rules} règles, {p.checkpoints} points, {p.test_cases} cas)",
+                key="saved_project"
+            )
+            if st.button("Ouvrir le projet", key="open_project_btn"):
+                open_project(project.id)
+
     # Onglets principaux
     tab1, tab2, tab3, tab4 = st.tabs(["Upload", "Analyse", "Points de contrôle", "Cas de test"])
 
     with tab1:
         st.header("Chargement du document")
         uploaded_file = st.file_uploader("Téléversez votre cahier des charges", type=["pdf", "docx", "txt"])
+        if uploaded_file is None:
+            # Fichier retiré : le téléverser à nouveau rouvre son document
+            st.session_state.upload_id = None
         
         if uploaded_file is not None:
             with st.spinner("Extraction du texte en cours..."):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                st.session_state.text = process_uploaded_file(tmp_path)
-                os.unlink(tmp_path)
+                # Extraction en mémoire, mise en cache par contenu (les reruns ne réextraient pas)
+                document = extract_document(uploaded_file)
+                upload_id = text_fingerprint(document.text)
+                # Le document courant ne change que si le fichier téléversé change : un projet
+                # ouvert depuis la barre latérale n'est pas remplacé par le fichier resté dans l'upload
+                if upload_id != st.session_state.upload_id:
+                    st.session_state.upload_id = upload_id
+                    st.session_state.text = document.text
+                    if upload_id != st.session_state.document_id:
+                        # Autre document : les résultats du précédent ne lui appartiennent pas
+                        st.session_state.document_id = upload_id
+                        reset_results()
+                    get_project_store().save_document(upload_id, uploaded_file.name, document.text,
+                                                      document.page_offsets, document.headings)
+                    sections = index_sections(document.text, document.page_offsets, document.headings or None)
+                    if sections != st.session_state.sections:
+                        # Nouveau document : les résultats par section ne s'appliquent plus
+                        st.session_state.sections = sections
+                        st.session_state.section_results = {}
+                        st.session_state.item_sections = {}
             
             st.success("Texte extrait avec succès !")
+            
+            # Résultats déjà générés pour ce document (autre session, autre analyste) : chargés à la demande
+            project = get_project_store().summary(st.session_state.document_id)
+            has_results = st.session_state.rules or st.session_state.checkpoints or st.session_state.test_cases
+            if project and (project.rules or project.checkpoints or project.test_cases) and not has_results:
+                st.info(f"Résultats enregistrés pour ce document : {project.rules} règles, "
+                        f"{project.checkpoints} points de contrôle et {project.test_cases} cas de test.")
+                if st.button("Reprendre les résultats enregistrés", key="load_project_btn"):
+                    load_project(project.id)
             with st.expander("Aperçu du texte extrait"):
                 st.text(st.session_state.text[:2000] + "...")
 
+            # Génération incrémentale : seuls les chunks nouveaux ou modifiés sont envoyés au modèle
+            st.divider()
+            st.subheader("Génération complète (incrémentale)")
+            if st.session_state.spec_index:
+                st.caption(f"Version précédente : {len(st.session_state.spec_index)} chunks déjà traités. "
+                           "Seuls les chunks nouveaux ou modifiés seront régénérés.")
+            
+            if st.button("Générer / mettre à jour règles, points et cas de test", key="gen_incremental_btn"):
+                # Les valeurs de session sont capturées ici : le thread de travail n'y a pas accès
+                text, previous_index = st.session_state.text, st.session_state.spec_index
+                client, max_workers = current_openai_client(), st.session_state.max_workers
+                batch_size, checkpoint_filter = st.session_state.test_batch_size, current_checkpoint_filter()
+                submit_job("incremental", lambda job: regenerate_incrementally(
+                    text,
+                    previous_index,
+                    client,
+                    max_workers=max_workers,
+                    test_batch_size=batch_size,
+                    progress_callback=lambda summary, done, total: job.set_progress(done, total, summary),
+                    on_error=lambda item, e: job.add_error(e),
+                    should_stop=lambda: job.cancelled,
+                    checkpoint_filter=checkpoint_filter
+                ))
+            render_job("incremental", "Génération incrémentale", str)
+            
+            # Pipeline complet : les étapes s'enchaînent en flux, sans attendre la fin de l'étape précédente
+            if st.button("Pipeline complet (tout régénérer)", key="gen_pipeline_btn"):
+                text, client = st.session_state.text, current_openai_client()
+                max_workers, batch_size = st.session_state.max_workers, st.session_state.test_batch_size
+                checkpoint_filter = current_checkpoint_filter()
+                
+                def pipeline_job(job):
+                    def show_test_cases(stage, key, values):
+                        if stage == "test_cases":
+                            for value in values:
+                                job.add_value(key, value)
+                    
+                    chunks = chunk_text(text, model=client.model)
+                    results, _ = run_pipeline(
+                        chunks,
+                        client,
+                        max_workers=max_workers,
+                        test_batch_size=batch_size,
+                        progress_callback=lambda summary, done, total: job.set_progress(done, total, summary),
+                        on_value=show_test_cases,
+                        on_error=lambda item, e: job.add_error(e),
+                        should_stop=lambda: job.cancelled,
+                        checkpoint_filter=checkpoint_filter
+                    )
+                    # Résultats par empreinte de chunk, pour la filiation enregistrée dans le projet
+                    chunk_results = {}
+                    for chunk, entry in zip(chunks, results):
+                        chunk_results.setdefault(chunk_fingerprint(chunk), entry)
+                    return chunk_results
+                
+                submit_job("pipeline", pipeline_job)
+            render_job("pipeline", "Pipeline complet", lambda case: case + "\n\n---", latest=5)
+            
+            if st.session_state.get("spec_provenance"):
+                with st.expander("Provenance par chunk"):
+                    st.dataframe(st.session_state.spec_provenance, use_container_width=True)
+            
+            # Génération par section : une requête par section, résultats rattachés à leur section
+            st.divider()
+            st.subheader("Génération par section")
+            sections = st.session_state.sections
+            section_results = st.session_state.section_results
+            with st.expander(f"{len(sections)} sections détectées"):
+                st.dataframe([{
+                    "section": section.id,
+                    "titre": "  " * max(section.level - 1, 0) + section.title,
+                    "nature": section.kind,
+                    "page": section.page,
+                    "règles": len(section_results.get(section.id, {}).get("rules", [])),
+                    "points": len(section_results.get(section.id, {}).get("checkpoints", [])),
+                    "cas de test": len(section_results.get(section.id, {}).get("test_cases", []))
+                } for section in sections], use_container_width=True)
+            
+            col_all, col_one = st.columns(2)
+            with col_all:
+                regenerate_all = st.button("Générer toutes les sections", key="gen_sections_btn")
+            with col_one:
+                labels = {section.id: section_label(section) for section in sections}
+                selected = st.selectbox("Section", list(labels), format_func=labels.get, key="section_select")
+                regenerate_one = st.button("Régénérer cette section", key="gen_section_btn",
+                                           disabled=selected is None)
+            
+            if regenerate_all or regenerate_one:
+                text, client = st.session_state.text, current_openai_client()
+                max_workers, batch_size = st.session_state.max_workers, st.session_state.test_batch_size
+                section_ids = {selected} if regenerate_one else None
+                checkpoint_filter = current_checkpoint_filter()
+                submit_job("sections", lambda job: generate_by_section(
+                    text,
+                    sections,
+                    client,
+                    section_ids=section_ids,
+                    previous=section_results,
+                    max_workers=max_workers,
+                    test_batch_size=batch_size,
+                    progress_callback=lambda summary, done, total: job.set_progress(done, total, summary),
+                    on_error=lambda item, e: job.add_error(e),
+                    should_stop=lambda: job.cancelled,
+                    checkpoint_filter=checkpoint_filter
+                ))
+            render_job("sections", "Génération par section", str)
+
     with tab2:
         st.header("Analyse Textuelle")
         
@@ -163,14 +576,12 @@ def main():
         with col1:
             st.subheader("Nuage de mots clés")
             with st.spinner("Génération du wordcloud..."):
-                fig = generate_wordcloud(st.session_state.text)
-                st.pyplot(fig)
+                # Image mise en cache par contenu : les reruns ne relancent ni spaCy ni le rendu
+                st.image(wordcloud_image(st.session_state.text), use_column_width=True)
         
         with col2:
             st.subheader("Mots les plus fréquents")
-            tokens = clean_text(st.session_state.text)
-            freq_dist = Counter(tokens)
-            top_words = freq_dist.most_common(10)
+            top_words = analyze_text(st.session_state.text).frequencies.most_common(10)
             
             for word, freq in top_words:
                 st.markdown(f"- **{word}**: {freq} occurrences")
@@ -187,29 +598,10 @@ def main():
         st.subheader("Génération des règles de gestion")
         
         if st.button("Générer les règles", type="primary", key="gen_rules_btn"):
-            with st.spinner("Analyse en cours avec IA..."):
-                try:
-                    chunks = [st.session_state.text[i:i+4000] for i in range(0, len(st.session_state.text), 4000)]
-                    all_rules = []
-                    
-                    progress_bar = st.progress(0)
-                    for i, chunk in enumerate(chunks, 1):
-                        progress = i / len(chunks)
-                        percent = int(progress * 100)
-                        progress_bar.progress(progress, text=f"{percent}% - Traitement chunk {i}/{len(chunks)}")
-                        rules = generate_rules(
-                            chunk,
-                            st.session_state.openai_key,
-                            st.session_state.openai_endpoint,
-                            st.session_state.model_name
-                        )
-                        all_rules.extend(rules)
-                    
-                    st.session_state.rules = [rule.strip() for rule in all_rules if rule.strip()]
-                    progress_bar.empty()
-                    st.success(f"{len(st.session_state.rules)} règles générées avec succès !")
-                except Exception as e:
-                    st.error(f"Erreur lors de la génération : {str(e)}")
+            # Les règles s'affichent au fur et à mesure de leur génération
+            text, client, max_workers = st.session_state.text, current_openai_client(), st.session_state.max_workers
+            submit_job("rules", lambda job: run_stream(job, stream_rules(text, client, max_workers=max_workers)))
+        render_job("rules", "Traitement chunk", lambda rule: f"- {rule}")
         
         # Affichage et export des règles
         if hasattr(st.session_state, 'rules') and st.session_state.rules:
@@ -231,57 +623,7 @@ def main():
             
             # Export multi-format
             st.subheader("Exporter les règles")
-            export_format = st.radio("Format d'export", ["Word (.docx)", "Texte (.txt)", "Excel (.xlsx)"], horizontal=True, key="rules_export_format")
-            
-            if export_format == "Word (.docx)":
-                try:
-                    doc = Document()
-                    doc.add_heading('Règles de Gestion', 0)
-                    
-                    for rule in st.session_state.rules:
-                        doc.add_paragraph(rule, style='ListBullet')
-                    
-                    docx_bytes = io.BytesIO()
-                    doc.save(docx_bytes)
-                    docx_bytes.seek(0)
-                    
-                    st.download_button(
-                        label="Télécharger (.docx)",
-                        data=docx_bytes.getvalue(),
-                        file_name="regles_gestion.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        key="download_rules_docx"
-                    )
-                except Exception as e:
-                    st.error(f"Erreur DOCX : {str(e)}")
-            
-            elif export_format == "Texte (.txt)":
-                try:
-                    txt_content = "RÈGLES DE GESTION\n\n" + \
-                                "\n".join(f"{i+1}. {r}" for i, r in enumerate(st.session_state.rules))
-                    
-                    st.download_button(
-                        label="Télécharger (.txt)",
-                        data=txt_content,
-                        file_name="regles_gestion.txt",
-                        mime="text/plain",
-                        key="download_rules_txt"
-                    )
-                except Exception as e:
-                    st.error(f"Erreur TXT : {str(e)}")
-            
-            elif export_format == "Excel (.xlsx)":
-                try:
-                    excel_data = export_to_excel(st.session_state.rules, "Regles_gestion")
-                    st.download_button(
-                        label="📊 Télécharger (.xlsx)",
-                        data=excel_data,
-                        file_name="regles_gestion.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        key="download_rules_excel"
-                    )
-                except Exception as e:
-                    st.error(f"Erreur Excel : {str(e)}")
+            render_export("rules", st.session_state.rules, "regles_gestion", "rules", "rules_export_format")
 
     with tab3:
         st.header("Points de Contrôle", divider="blue")
@@ -298,38 +640,12 @@ def main():
             if st.button("Générer les points de contrôle à partir du texte", 
                         type="primary",
                         key="gen_cp_from_text"):
-                with st.spinner("Analyse du texte pour générer les points de contrôle..."):
-                    try:
-                        progress_bar = st.progress(0, text="0% - Préparation...")
-                        
-                        # Découpage du texte en chunks
-                        chunks = [st.session_state.text[i:i+4000] for i in range(0, len(st.session_state.text), 4000)]
-                        all_points = []
-                        
-                        for i, chunk in enumerate(chunks):
-                            # Mise à jour de la barre de progression
-                            percent = int((i + 1) / len(chunks) * 100)
-                            progress_bar.progress(percent / 100, text=f"{percent}% - Traitement du chunk {i+1}/{len(chunks)}")
-                            
-                            # Génération des points pour chaque chunk
-                            points = generate_checkpoints(
-                                [chunk],  # On passe le chunk comme une "règle"
-                                st.session_state.openai_key,
-                                st.session_state.openai_endpoint,
-                                st.session_state.model_name
-                            )
-                            all_points.extend(points)
-                        
-                        # Suppression des doublons
-                        existing_points = getattr(st.session_state, 'existing_checkpoints', [])
-                        final_points = remove_duplicates(all_points, existing_points)
-                        
-                        st.session_state.checkpoints = existing_points + final_points
-                        st.success(f"{len(final_points)} points de contrôle générés directement à partir du texte !")
-                    except Exception as e:
-                        st.error(f"Échec de la génération : {str(e)}")
-                    finally:
-                        progress_bar.empty()
+                # Découpage du texte en chunks, chaque chunk est traité comme une "règle"
+                chunks = chunk_text(st.session_state.text, model=st.session_state.model_name)
+                client, max_workers = current_openai_client(), st.session_state.max_workers
+                submit_job("checkpoints", lambda job: run_stream(
+                    job, stream_checkpoints(chunks, client, batch_size=1, max_workers=max_workers)
+                ))
 
         # Conserver la section existante pour la génération à partir des règles
         st.divider()
@@ -341,39 +657,12 @@ def main():
             if st.button("Générer les points de contrôle à partir des règles", 
                         type="primary",
                         key="gen_cp_from_rules"):
-                with st.spinner("Transformation des règles en points vérifiables..."):
-                    try:
-                        progress_bar = st.progress(0, text="0% - Préparation...")
-                        total_rules = len(st.session_state.rules)
-                        
-                        # Génération avec progression
-                        new_points = []
-                        batch_size = 5
-                        
-                        for i in range(0, total_rules, batch_size):
-                            # Mise à jour de la progression
-                            processed = min(i + batch_size, total_rules)
-                            percent = int(processed / total_rules * 100)
-                            progress_bar.progress(percent / 100, text=f"{percent}% - Traitement des règles {processed}/{total_rules}")
-                            
-                            batch = st.session_state.rules[i:i + batch_size]
-                            points = generate_checkpoints(
-                                batch,
-                                st.session_state.openai_key,
-                                st.session_state.openai_endpoint,
-                                st.session_state.model_name
-                            )
-                            new_points.extend(points)
-                        
-                        existing_points = getattr(st.session_state, 'existing_checkpoints', [])
-                        final_points = remove_duplicates(new_points, existing_points)
-                        
-                        st.session_state.checkpoints = existing_points + final_points
-                        st.success(f"{len(final_points)} points de contrôle générés à partir des règles !")
-                    except Exception as e:
-                        st.error(f"Échec de la génération : {str(e)}")
-                    finally:
-                        progress_bar.empty()
+                # Génération par lots de 5 règles
+                rules, client, max_workers = st.session_state.rules, current_openai_client(), st.session_state.max_workers
+                submit_job("checkpoints", lambda job: run_stream(
+                    job, stream_checkpoints(rules, client, max_workers=max_workers)
+                ))
+        render_job("checkpoints", "Traitement des lots", lambda point: f"- {point}")
 
         # Section d'import des points existants
         st.subheader("Importer des points existants (facultatif)")
@@ -387,25 +676,8 @@ def main():
         if existing_cp_file:
             with st.spinner("Analyse du fichier en cours..."):
                 try:
-                    # Extraction du contenu brut
-                    if existing_cp_file.type == "text/plain":
-                        content = existing_cp_file.getvalue().decode("utf-8")
-                    elif existing_cp_file.type == "application/pdf":
-                        reader = PyPDF2.PdfReader(existing_cp_file)
-                        content = "\n".join([page.extract_text() for page in reader.pages])
-                    elif existing_cp_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                        doc = Document(existing_cp_file)
-                        content = "\n".join([para.text for para in doc.paragraphs])
-                
-                    # Extraction des points
-                    pattern = r"^(Vérifier|S['']?assurer|Verifier|►|•|\d+[.)])\s+"
-                    points = []
-                    for line in content.split('\n'):
-                        line = line.strip()
-                        if re.match(pattern, line, re.IGNORECASE):
-                            clean_point = re.sub(pattern, "", line, flags=re.IGNORECASE)
-                            if clean_point:
-                                points.append(clean_point)
+                    # Même extraction que le cahier des charges, mise en cache par contenu
+                    points = extract_checkpoints(existing_cp_file)
                 
                     if points:
                         st.session_state.existing_checkpoints = points
@@ -428,126 +700,30 @@ def main():
                 with col_filter:
                     filter_type = st.selectbox("Filtrer par", ["Tous", "Existants uniquement", "Nouveaux uniquement"], key="filter_type_cp")
             
-            # Application des filtres
-            filtered_points = st.session_state.checkpoints.copy()
-            
-            if search_term:
-                filtered_points = [p for p in filtered_points if search_term.lower() in p.lower()]
-            
-            if filter_type == "Existants uniquement":
-                existing_points = getattr(st.session_state, 'existing_checkpoints', [])
-                filtered_points = [p for p in filtered_points if p in existing_points]
-            elif filter_type == "Nouveaux uniquement":
-                existing_points = getattr(st.session_state, 'existing_checkpoints', [])
-                filtered_points = [p for p in filtered_points if p not in existing_points]
-            
-            if sort_order == "Ordre alphabétique":
-                filtered_points.sort(key=lambda x: x.lower())
-            
-            # Pagination
-            items_per_page = st.slider("Points par page", 5, 50, 10, key="cp_per_page")
-            total_pages = max(1, (len(filtered_points) + items_per_page - 1) // items_per_page)
-            page = st.number_input("Page", 1, total_pages, 1, key="cp_page")
-            start_idx = (page - 1) * items_per_page
-            end_idx = start_idx + items_per_page
+            # Filtrage sur l'index (reconstruit seulement quand les points changent)
+            store = checkpoint_store(
+                st.session_state.checkpoints,
+                getattr(st.session_state, 'existing_checkpoints', []),
+                st.session_state.item_sections
+            )
+            existing_filter = {"Existants uniquement": True, "Nouveaux uniquement": False}.get(filter_type)
+            positions = store.query(search_term, existing_filter, sort_order == "Ordre alphabétique")
             
-            # Affichage
-            for i, point in enumerate(filtered_points[start_idx:end_idx], start=start_idx+1):
-                is_existing = hasattr(st.session_state, 'existing_checkpoints') and \
-                            point in st.session_state.existing_checkpoints
-                
-                st.markdown(f"""
-                <div style='
-                    padding:10px;
-                    margin:5px 0;
-                    border-left:4px solid {"#4CAF50" if not is_existing else "#2196F3"};
-                    background:#f8f9fa;
-                    border-radius:5px;
-                    box-shadow:0 1px 2px rgba(0,0,0,0.1)'
-                >
-                    <div style='font-weight:bold; margin-bottom:3px'>
-                        Point {i} {"(nouveau)" if not is_existing else "(existant)"}
-                    </div>
-                    <div>{point}</div>
-                </div>
-                """, unsafe_allow_html=True)
+            # Tableau unique : seules les lignes visibles sont rendues
+            section_labels = {section.id: section_label(section) for section in st.session_state.sections}
+            st.dataframe(
+                store.frame(positions, section_labels),
+                hide_index=True,
+                use_container_width=True,
+                column_config={"point de contrôle": st.column_config.TextColumn(width="large")}
+            )
             
-            st.caption(f"Page {page}/{total_pages} • {len(filtered_points)} points filtrés • {len(st.session_state.checkpoints)} points au total")
+            st.caption(f"{len(positions)} points filtrés • {len(store)} points au total")
 
             # Export des points
             st.subheader("Exporter les points")
-            export_format = st.radio("Format d'export", ["Word (.docx)", "Texte (.txt)", "Excel (.xlsx)"], horizontal=True, key="cp_export_format")
-            
-            if export_format == "Word (.docx)":
-                try:
-                    doc = Document()
-                    doc.add_heading('Points de Contrôle', level=1)
-                    
-                    if hasattr(st.session_state, 'existing_checkpoints') and st.session_state.existing_checkpoints:
-                        doc.add_heading('Points Existants', level=2)
-                        for point in st.session_state.existing_checkpoints:
-                            doc.add_paragraph(point, style='ListBullet')
-                    
-                    existing_set = set(getattr(st.session_state, 'existing_checkpoints', []))
-                    new_points = [p for p in st.session_state.checkpoints if p not in existing_set]
-                    
-                    if new_points:
-                        doc.add_heading('Nouveaux Points', level=2)
-                        for point in new_points:
-                            doc.add_paragraph(point, style='ListBullet')
-                    
-                    doc_bytes = io.BytesIO()
-                    doc.save(doc_bytes)
-                    doc_bytes.seek(0)
-                    
-                    st.download_button(
-                        label="Télécharger le DOCX",
-                        data=doc_bytes.getvalue(),
-                        file_name="points_controle.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        key="download_cp_docx"
-                    )
-                except Exception as e:
-                    st.error(f"Erreur DOCX : {str(e)}")
-            
-            elif export_format == "Texte (.txt)":
-                try:
-                    content = "POINTS DE CONTRÔLE\n\n"
-                    content += f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}\n\n"
-                    
-                    if hasattr(st.session_state, 'existing_checkpoints') and st.session_state.existing_checkpoints:
-                        content += "=== POINTS EXISTANTS ===\n"
-                        content += "\n".join(f"• {p}" for p in st.session_state.existing_checkpoints) + "\n\n"
-                    
-                    existing_set = set(getattr(st.session_state, 'existing_checkpoints', []))
-                    new_points = [p for p in st.session_state.checkpoints if p not in existing_set]
-                    
-                    if new_points:
-                        content += "=== NOUVEAUX POINTS ===\n"
-                        content += "\n".join(f"• {p}" for p in new_points)
-                    
-                    st.download_button(
-                        label="Télécharger le TXT",
-                        data=content,
-                        file_name="points_controle.txt",
-                        mime="text/plain",
-                        key="download_cp_txt"
-                    )
-                except Exception as e:
-                    st.error(f"Erreur TXT : {str(e)}")
-            
-            elif export_format == "Excel (.xlsx)":
-                try:
-                    excel_data = export_to_excel(st.session_state.checkpoints, "Points_de_controle")
-                    st.download_button(
-                        label="📊 Télécharger (.xlsx)",
-                        data=excel_data,
-                        file_name="points_controle.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        key="download_cp_excel"
-                    )
-                except Exception as e:
-                    st.error(f"Erreur Excel : {str(e)}")
+            render_export("checkpoints", st.session_state.checkpoints, "points_controle", "cp", "cp_export_format",
+                          existing=getattr(st.session_state, 'existing_checkpoints', []))
 
     with tab4:
         st.header("Cas de Test")
@@ -558,105 +734,43 @@ def main():
             if st.button("Générer les cas de test", 
                         type="primary",
                         key="gen_tests_from_points"):
-                with st.spinner("Création des cas de test..."):
-                    try:
-                        progress_bar = st.progress(0, text="0% - Préparation...")
-                        st.session_state.test_cases = []
-                        
-                        # Initialisation de la barre de progression
-                        total = len(st.session_state.checkpoints)
-                        
-                        # Génération des cas de test avec progression
-                        test_cases = []
-                        for i, checkpoint in enumerate(st.session_state.checkpoints, 1):
-                            percent = int(i / total * 100)
-                            progress_bar.progress(percent / 100, text=f"{percent}% - Génération du cas {i}/{total}")
-                            
-                            test_case = generate_test_cases(
-                                [checkpoint],
-                                st.session_state.openai_key,
-                                st.session_state.openai_endpoint,
-                                st.session_state.model_name
-                            )
-                            test_cases.extend(test_case)
-                        
-                        st.session_state.test_cases = test_cases
-                        progress_bar.empty()
-                        st.success(f"{len(st.session_state.test_cases)} cas de test générés !")
-                    except Exception as e:
-                        st.error(f"Erreur de génération : {str(e)}")
+                # Chaque cas de test s'affiche dès que sa requête aboutit
+                checkpoints, client = st.session_state.checkpoints, current_openai_client()
+                batch_size, max_workers = st.session_state.test_batch_size, st.session_state.max_workers
+                semantic, threshold = st.session_state.semantic_dedup, st.session_state.semantic_threshold
+                
+                def test_cases_job(job):
+                    points = checkpoints
+                    if semantic:
+                        # Un seul cas de test par groupe de points de contrôle équivalents
+                        points, _ = semantic_deduplicate(checkpoints, threshold)
+                        job.set_progress(0, 0, f"{len(checkpoints) - len(points)} points redondants écartés •")
+                    return run_stream(
+                        job, stream_test_cases(points, client, batch_size=batch_size, max_workers=max_workers)
+                    )
+                
+                submit_job("test_cases", test_cases_job)
+            render_job("test_cases", "Génération des lots", lambda case: case + "\n\n---", latest=5)
 
             # Affichage des résultats
             if hasattr(st.session_state, 'test_cases') and st.session_state.test_cases:
                 selected_case = st.selectbox(
                     "Sélectionnez un cas à visualiser",
                     range(len(st.session_state.test_cases)),
-                    format_func=lambda x: f"Cas de test #{x+1}",
+                    format_func=lambda x: f"Cas de test #{x+1} {st.session_state.test_cases[x].title}".rstrip(),
                     key="select_test_case"
                 )
                 
-                st.markdown(st.session_state.test_cases[selected_case])
+                st.markdown(st.session_state.test_cases[selected_case].markdown)
                 
                 # Export
                 st.subheader("Exporter les cas de test")
-                export_format = st.radio("Format d'export", ["Word (.docx)", "Texte (.txt)", "Excel (.xlsx)"], horizontal=True, key="test_export_format")
-                
-                if export_format == "Word (.docx)":
-                    try:
-                        doc = Document()
-                        doc.add_heading('Cas de Test', level=1)
-                        
-                        for i, test_case in enumerate(st.session_state.test_cases, 1):
-                            cleaned_text = re.sub(r'#+\s*', '', test_case)
-                            cleaned_text = re.sub(r'\*\*(.*?)\*\*', r'\1', cleaned_text)
-                            doc.add_paragraph(f"Cas de test {i}", style='Heading2')
-                            doc.add_paragraph(cleaned_text)
-                        
-                        docx_bytes = io.BytesIO()
-                        doc.save(docx_bytes)
-                        docx_bytes.seek(0)
-                        
-                        st.download_button(
-                            label="Télécharger (.docx)",
-                            data=docx_bytes.getvalue(),
-                            file_name="cas_de_test.docx",
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                            key="download_tests_docx"
-                        )
-                    except Exception as e:
-                        st.error(f"Erreur DOCX : {str(e)}")
-                
-                elif export_format == "Texte (.txt)":
-                    try:
-                        txt_content = "CAS DE TEST\n\n"
-                        txt_content += f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}\n\n"
-                        txt_content += "\n\n".join(
-                            f"=== CAS DE TEST {i+1} ===\n{re.sub(r'#+\s*|\*\*', '', case)}" 
-                            for i, case in enumerate(st.session_state.test_cases)
-                        )
-                        
-                        st.download_button(
-                            label="📄 Télécharger (.txt)",
-                            data=txt_content,
-                            file_name="cas_de_test.txt",
-                            mime="text/plain",
-                            key="download_tests_txt"
-                        )
-                    except Exception as e:
-                        st.error(f"Erreur TXT : {str(e)}")
-                
-                elif export_format == "Excel (.xlsx)":
-                    try:
-                        excel_data = export_test_cases_to_excel(st.session_state.test_cases)
-                        st.download_button(
-                            label="📊 Télécharger (.xlsx)",
-                            data=excel_data,
-                            file_name="cas_de_test.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            key="download_tests_excel"
-                        )
-                    except Exception as e:
-                        st.error(f"Erreur Excel : {str(e)}")
+                render_export("test_cases", st.session_state.test_cases, "cas_de_test", "tests", "test_export_format")
+
+    # Rafraîchissement périodique tant qu'une tâche de la session est en cours
+    if any(job.active for job in get_job_registry().jobs_for(st.session_state.session_id)):
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
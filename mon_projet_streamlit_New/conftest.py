@@ -0,0 +1 @@
+# Rend le package `utils` importable par les tests (exécutés depuis ce dossier).
@@ -0,0 +1,41 @@
+import io
+import zipfile
+
+from utils.file_utils import DocxBlock, extract_document, iter_docx_blocks
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _docx(*paragraphs: str) -> bytes:
+    body = "".join(paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", '<?xml version="1.0"?><Types/>')
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+
+def _paragraph(text: str, properties: str = "") -> str:
+    return f"<w:p><w:pPr>{properties}</w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def test_docx_heading_levels():
+    data = _docx(
+        _paragraph("Objet", '<w:pStyle w:val="Heading1"/>'),
+        _paragraph("Périmètre", '<w:outlineLvl w:val="1"/>'),
+        _paragraph("Corps", '<w:outlineLvl w:val="9"/>'),
+        _paragraph("Texte"),
+    )
+    assert list(iter_docx_blocks(data)) == [
+        DocxBlock("heading", "Objet", 1),
+        DocxBlock("heading", "Périmètre", 2),
+        DocxBlock("paragraph", "Corps", 0),
+        DocxBlock("paragraph", "Texte", 0),
+    ]
+    assert extract_document(data).headings == {"Objet": 1, "Périmètre": 2}
+
+
+def test_docx_without_heading_styles():
+    document = extract_document(_docx(_paragraph("1. Objet du document"), _paragraph("Texte")))
+    assert document.text == "1. Objet du document\nTexte"
+    assert document.headings is None
@@ -0,0 +1,32 @@
+from utils.section_utils import build_section_index
+
+TEXT = (
+    "Cahier des charges\n"
+    "1. Objet du document\n"
+    "Ce document décrit la saisie des contrats.\n"
+    "2. Règles de gestion\n"
+    "RG-01 Le montant est positif\n"
+    "RG-02 La date de fin suit la date de début\n"
+)
+
+
+def test_pattern_headings_without_styled_headings():
+    for styled_headings in (None, {}):
+        sections = build_section_index(TEXT, styled_headings=styled_headings)
+        assert [(section.title, section.kind) for section in sections[1:]] == [
+            ("1. Objet du document", "titre"),
+            ("2. Règles de gestion", "titre"),
+            ("RG-01 Le montant est positif", "exigence"),
+            ("RG-02 La date de fin suit la date de début", "exigence"),
+        ]
+        assert sections[3].parent == sections[2].id
+
+
+def test_styled_headings_replace_pattern_headings():
+    sections = build_section_index(TEXT, styled_headings={"Cahier des charges": 1, "2. Règles de gestion": 2})
+    assert [(section.title, section.level) for section in sections] == [
+        ("Cahier des charges", 1),
+        ("2. Règles de gestion", 2),
+        ("RG-01 Le montant est positif", 3),
+        ("RG-02 La date de fin suit la date de début", 3),
+    ]
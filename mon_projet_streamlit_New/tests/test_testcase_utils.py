@@ -0,0 +1,114 @@
+from utils.testcase_utils import parse_test_case_markdown, parse_test_cases
+
+BOLD_STEPS = """### ID du test
+TC-001
+### Titre
+Saisie d'un contrat valide
+### Préconditions
+L'utilisateur est connecté
+### Données d'entrée
+Montant : 1000
+### Étapes
+**Étape 1** : Ouvrir l'écran de saisie
+**Étape 2** : Saisir le montant
+**Étape 3** : Valider
+### Résultat attendu
+Le contrat est enregistré"""
+
+
+def test_bold_step_bullets_stay_in_steps():
+    cases = parse_test_case_markdown(BOLD_STEPS)
+    assert len(cases) == 1
+    case = cases[0]
+    assert case.id == "TC-001"
+    assert case.title == "Saisie d'un contrat valide"
+    assert case.steps.splitlines() == [
+        "**Étape 1** : Ouvrir l'écran de saisie",
+        "**Étape 2** : Saisir le montant",
+        "**Étape 3** : Valider",
+    ]
+    assert case.expected == "Le contrat est enregistré"
+
+
+def test_bold_labels():
+    markdown = (
+        "**ID :** TC-002\n"
+        "**Titre :** Montant négatif refusé\n"
+        "**Préconditions** : aucune\n"
+        "**Étapes :**\n"
+        "1. Saisir -5\n"
+        "2. Valider\n"
+        "**Résultat attendu :** Un message d'erreur s'affiche"
+    )
+    [case] = parse_test_case_markdown(markdown)
+    assert case.id == "TC-002"
+    assert case.title == "Montant négatif refusé"
+    assert case.preconditions == "aucune"
+    assert case.steps == "1. Saisir -5\n2. Valider"
+    assert case.expected == "Un message d'erreur s'affiche"
+
+
+def test_numbered_steps_and_step_subheadings():
+    markdown = (
+        "### 1. Titre\n"
+        "Export du rapport\n"
+        "### 2. Étapes\n"
+        "#### Étape 1\n"
+        "Ouvrir le rapport\n"
+        "1) Cliquer sur Exporter\n"
+        "### 3. Résultat attendu\n"
+        "Un fichier est téléchargé"
+    )
+    [case] = parse_test_case_markdown(markdown)
+    assert case.title == "Export du rapport"
+    assert case.steps == "#### Étape 1\nOuvrir le rapport\n1) Cliquer sur Exporter"
+    assert case.expected == "Un fichier est téléchargé"
+
+
+def test_several_cases_in_one_response():
+    markdown = (
+        "## Cas de test 1\n"
+        "### ID du test\nTC-1\n### Titre\nPremier\n### Étapes\n**Étape 1** : A\n### Résultat attendu\nOK\n\n"
+        "## Cas de test 2\n"
+        "### ID du test\nTC-2\n### Titre\nSecond\n### Étapes\n**Étape 1** : B\n### Résultat attendu\nKO"
+    )
+    first, second = parse_test_case_markdown(markdown)
+    assert (first.id, first.title, first.steps, first.expected) == ("TC-1", "Premier", "**Étape 1** : A", "OK")
+    assert (second.id, second.title, second.steps, second.expected) == ("TC-2", "Second", "**Étape 1** : B", "KO")
+    assert second.markdown.startswith("## Cas de test 2")
+
+
+def test_bold_labels_after_hashes():
+    markdown = (
+        "### **ID du test**\nTC-003\n"
+        "### **Titre**\nConnexion refusée\n"
+        "### **Étapes**\n- **Étape 1** : Saisir un mot de passe erroné\n"
+        "### 2. **Résultat attendu**\nUn message d'erreur s'affiche"
+    )
+    [case] = parse_test_case_markdown(markdown)
+    assert case.id == "TC-003"
+    assert case.title == "Connexion refusée"
+    assert case.steps == "- **Étape 1** : Saisir un mot de passe erroné"
+    assert case.expected == "Un message d'erreur s'affiche"
+
+
+def test_bulleted_bold_labels():
+    markdown = (
+        "- **ID** : TC-004\n"
+        "- **Titre** : Export vide\n"
+        "- **Étapes** :\n"
+        "  1. Ouvrir un rapport sans ligne\n"
+        "  2. Exporter\n"
+        "* **Résultat attendu** : Le fichier ne contient que l'en-tête"
+    )
+    [case] = parse_test_case_markdown(markdown)
+    assert case.id == "TC-004"
+    assert case.title == "Export vide"
+    assert case.steps == "1. Ouvrir un rapport sans ligne\n  2. Exporter"
+    assert case.expected == "Le fichier ne contient que l'en-tête"
+
+
+def test_response_without_fields_is_kept_as_text():
+    [case] = parse_test_cases(["Réponse libre sans rubrique"])
+    assert case.markdown == "Réponse libre sans rubrique"
+    assert case.title == ""
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Emplacement par défaut du cache des réponses LLM (surchargeable par variable d'environnement)
+DEFAULT_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "testing_factory", "llm_responses.sqlite")
+)
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # 30 jours
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 Mo
+
+
+def make_cache_key(model: str, prompt_version: str, temperature: float, max_tokens: int, prompt: str) -> str:
+    """Calcule la clé de cache (SHA-256) d'une requête."""
+    raw = json.dumps([model, prompt_version, temperature, max_tokens, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache persistant des réponses LLM, adressé par contenu (SQLite).
+
+    Les entrées plus vieilles que `max_age` secondes sont supprimées, et les moins
+    récemment utilisées sont évincées lorsque la taille totale dépasse `max_bytes`.
+    Une seule connexion est partagée entre les threads, protégée par un verrou.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_age: float = DEFAULT_MAX_AGE,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created)")
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourne la réponse en cache, ou None."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Enregistre une réponse puis applique la politique d'éviction."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+        self.evict()
+
+    def evict(self) -> None:
+        """Supprime les entrées expirées puis les moins récentes au-delà de la taille maximale."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            excess = total - self.max_bytes
+            to_delete = []
+            for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                to_delete.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs de succès/échecs et occupation du cache."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+class MemoryCache:
+    """
+    Petit cache LRU en mémoire, partagé entre les threads (et donc les sessions).
+
+    Le calcul d'une valeur absente se fait hors verrou : deux threads peuvent
+    calculer la même valeur en parallèle, le dernier résultat est conservé.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Retourne la valeur associée à `key`, ou None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Retourne la valeur associée à `key`, en la calculant avec `compute` si besoin."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
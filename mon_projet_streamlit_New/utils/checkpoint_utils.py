@@ -0,0 +1,106 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from utils.cache_utils import MemoryCache
+
+# Mots indexés pour la recherche (lettres accentuées comprises)
+WORD_PATTERN = re.compile(r"\w+")
+STORE_CACHE_SIZE = 4
+
+_stores = MemoryCache(STORE_CACHE_SIZE)
+
+
+class CheckpointStore:
+    """
+    Points de contrôle indexés pour la visualisation.
+
+    Les indicateurs existant/nouveau, le texte en minuscules, l'ordre alphabétique
+    et un index inversé (mot -> positions) sont calculés une seule fois ; une
+    recherche ne vérifie ensuite que les points candidats.
+    """
+
+    def __init__(
+        self,
+        checkpoints: Sequence[str],
+        existing: Iterable[str] = (),
+        origins: Optional[Dict[str, str]] = None
+    ):
+        existing_set = set(existing)
+        origins = origins or {}
+        self.points = list(checkpoints)
+        self.lowered = [point.lower() for point in self.points]
+        self.is_existing = [point in existing_set for point in self.points]
+        self.origins = [origins.get(point) for point in self.points]
+        self.alphabetical = sorted(range(len(self.points)), key=self.lowered.__getitem__)
+
+        postings = defaultdict(set)
+        for position, text in enumerate(self.lowered):
+            for word in WORD_PATTERN.findall(text):
+                postings[word].add(position)
+        self._postings: Dict[str, frozenset] = {word: frozenset(p) for word, p in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _candidates(self, term: str) -> Optional[frozenset]:
+        """Positions pouvant contenir `term` d'après l'index, ou None si l'index ne permet pas de filtrer."""
+        candidates = None
+        for word in WORD_PATTERN.findall(term):
+            # Un mot de la recherche peut n'être qu'une partie d'un mot indexé
+            matching = set()
+            for indexed, positions in self._postings.items():
+                if word in indexed:
+                    matching |= positions
+            candidates = frozenset(matching) if candidates is None else candidates & matching
+            if not candidates:
+                break
+        return candidates
+
+    def query(self, search: str = "", existing: Optional[bool] = None, alphabetical: bool = False) -> List[int]:
+        """
+        Positions des points correspondant aux filtres.
+
+        Args:
+            search: Texte recherché (sous-chaîne, insensible à la casse)
+            existing: True pour les points existants, False pour les nouveaux, None pour tous
+            alphabetical: Trie par ordre alphabétique plutôt que dans l'ordre d'origine
+        """
+        term = search.lower()
+        candidates = self._candidates(term) if term else None
+        order = self.alphabetical if alphabetical else range(len(self.points))
+        if candidates is not None and len(candidates) < len(self.points) // 4:
+            order = sorted(candidates, key=self.lowered.__getitem__) if alphabetical else sorted(candidates)
+        return [
+            position for position in order
+            if (candidates is None or position in candidates)
+            and (existing is None or self.is_existing[position] == existing)
+            and (not term or term in self.lowered[position])
+        ]
+
+    def frame(self, positions: Sequence[int], section_labels: Optional[Dict[str, str]] = None) -> Dict[str, list]:
+        """Colonnes à afficher dans un tableau (st.dataframe) pour les positions données."""
+        section_labels = section_labels or {}
+        return {
+            "n°": [position + 1 for position in positions],
+            "statut": ["existant" if self.is_existing[position] else "nouveau" for position in positions],
+            "section": [section_labels.get(self.origins[position], "") for position in positions],
+            "point de contrôle": [self.points[position] for position in positions],
+        }
+
+
+def checkpoint_store(
+    checkpoints: Sequence[str],
+    existing: Sequence[str] = (),
+    origins: Optional[Dict[str, str]] = None
+) -> CheckpointStore:
+    """CheckpointStore mis en cache par contenu : les reruns ne reconstruisent pas l'index."""
+    origins = origins or {}
+    digest = hashlib.sha1()
+    for point in checkpoints:
+        digest.update(f"{point}\x1f{origins.get(point, '')}\x1e".encode("utf-8"))
+    digest.update(b"\x1d")
+    for point in existing:
+        digest.update(point.encode("utf-8") + b"\x1e")
+    return _stores.get_or_compute(digest.hexdigest(), lambda: CheckpointStore(checkpoints, existing, origins))
@@ -0,0 +1,214 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Budget par défaut d'un chunk (en tokens du modèle)
+DEFAULT_CHUNK_TOKENS = 1500
+DEFAULT_MODEL = "gpt-4o"
+
+# Titres : "# Titre", "2.3.1 Objet", "1. Objet du document", "Article 4", "CHAPITRE II" ou ligne
+# courte en majuscules. Une ligne qui commence par un simple nombre ("30 jours après...",
+# ligne de PDF renvoyée à la ligne) n'est pas un titre.
+HEADING_PATTERN = re.compile(
+    r"^(#{1,6}\s+\S|\d+(\.\d+)+\.?\s+\S|\d+\.\s+[A-ZÀ-Ý][^.;:!?]{0,80}$"
+    r"|(?i:article|chapitre|section|annexe)\s+[\w.]+|[A-ZÀ-Ý0-9][A-ZÀ-Ý0-9 '’\-]{2,80}$)"
+)
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;:])\s+")
+
+
+@lru_cache(maxsize=8)
+def _get_encoder(model: str):
+    """Retourne l'encodeur tiktoken du modèle, ou None s'il est indisponible."""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            return None
+
+
+def get_token_counter(model: str = DEFAULT_MODEL) -> Callable[[str], int]:
+    """
+    Retourne une fonction de comptage de tokens pour le modèle.
+
+    Sans tiktoken (ou sans ses fichiers d'encodage), on estime à 4 caractères par token.
+    """
+    encoder = _get_encoder(model)
+    if encoder is None:
+        return lambda text: (len(text) + 3) // 4
+    return lambda text: len(encoder.encode(text, disallowed_special=()))
+
+
+def is_heading(block: str) -> bool:
+    """Indique si un bloc ressemble à un titre de section ou d'exigence."""
+    first_line = block.strip().split("\n", 1)[0]
+    return len(first_line) <= 120 and bool(HEADING_PATTERN.match(first_line))
+
+
+def _split_characters(text: str, max_tokens: int, count: Callable[[str], int]) -> List[str]:
+    """Découpe par caractères un texte sans espace trop long (identifiant, base64, tableau aplati...)."""
+    step = max(1, len(text) * max_tokens // (count(text) + 1))
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + step)
+        while end - start > 1 and count(text[start:end]) > max_tokens:
+            end = start + (end - start) * 3 // 4
+        pieces.append(text[start:end])
+        start = end
+    return pieces
+
+
+def _split_oversized(block: str, max_tokens: int, count: Callable[[str], int]) -> List[str]:
+    """Découpe un bloc trop long par phrases, puis par mots, puis par caractères en dernier recours."""
+    pieces = []
+    current = []
+    size = 0
+    for sentence in SENTENCE_SPLIT.split(block):
+        sentence_tokens = count(sentence)
+        if sentence_tokens > max_tokens:
+            words = sentence.split(" ")
+            step = max(1, len(words) * max_tokens // (sentence_tokens + 1))
+            sub_sentences = []
+            for i in range(0, len(words), step):
+                sub = " ".join(words[i:i + step])
+                if count(sub) > max_tokens:
+                    sub_sentences.extend(_split_characters(sub, max_tokens, count))
+                else:
+                    sub_sentences.append(sub)
+        else:
+            sub_sentences = [sentence]
+        for sub in sub_sentences:
+            sub_tokens = count(sub)
+            if current and size + sub_tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current, size = [], 0
+            current.append(sub)
+            size += sub_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+# Frontières dépendant du contenu : une ligne sur CONTENT_BOUNDARY_MODULUS, une fois
+# le chunk rempli à moitié
+CONTENT_BOUNDARY_MODULUS = 8
+
+
+def _is_content_boundary(block: str) -> bool:
+    """Frontière définie par le contenu (environ une ligne sur CONTENT_BOUNDARY_MODULUS)."""
+    return int(hashlib.sha1(block.encode("utf-8")).hexdigest()[:8], 16) % CONTENT_BOUNDARY_MODULUS == 0
+
+
+def _split_units(text: str, max_tokens: int, count: Callable[[str], int]) -> List[Tuple[str, int, str]]:
+    """
+    Découpe le texte en lignes non vides, unités du regroupement en chunks.
+
+    Les textes extraits des PDF et DOCX séparent leurs blocs par un simple saut de
+    ligne : découper par ligne (et non par paragraphe) permet de reconnaître les
+    titres et de placer les frontières dépendant du contenu sur tout type de document.
+
+    Returns:
+        Liste de (texte, tokens, séparateur avec l'unité précédente)
+    """
+    units = []
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        separator = "\n\n"
+        for line in paragraph.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            tokens = count(line)
+            if tokens > max_tokens:
+                for position, piece in enumerate(_split_oversized(line, max_tokens, count)):
+                    units.append((piece, count(piece), separator if position == 0 else " "))
+            else:
+                units.append((line, tokens, separator))
+            separator = "\n"
+    return units
+
+
+def _join(units: List[Tuple[str, int, str]]) -> str:
+    """Recompose le texte d'un chunk en conservant sauts de ligne et de paragraphe."""
+    parts = []
+    for position, (unit, _, separator) in enumerate(units):
+        if position:
+            parts.append(separator)
+        parts.append(unit)
+    return "".join(parts)
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = 0,
+    model: str = DEFAULT_MODEL,
+    content_defined: bool = False
+) -> List[str]:
+    """
+    Découpe le texte en chunks d'au plus `max_tokens` tokens, sans couper les lignes.
+
+    Les lignes sont regroupées de manière gloutonne ; un titre ouvre un nouveau
+    chunk dès que le chunk courant est à moitié plein, pour garder chaque section
+    d'un seul tenant. Les lignes trop longues sont découpées par phrases.
+
+    Args:
+        text: Texte à découper
+        max_tokens: Budget maximal d'un chunk
+        overlap_tokens: Nombre de tokens du chunk précédent repris en tête du suivant
+            (en plus du budget)
+        model: Modèle dont le tokenizer sert au comptage
+        content_defined: Ferme aussi les chunks sur des frontières dépendant du contenu
+            (à partir de la moitié du budget), pour qu'une modification locale ne
+            décale pas les chunks suivants d'une version à l'autre
+
+    Returns:
+        Liste des chunks
+    """
+    count = get_token_counter(model)
+    units = _split_units(text, max_tokens, count)
+
+    chunks: List[List[tuple]] = []
+    current: List[tuple] = []
+    size = 0
+    for unit in units:
+        block, tokens, _ = unit
+        starts_section = is_heading(block) and size >= max_tokens // 2
+        if current and (size + tokens > max_tokens or starts_section):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+        if content_defined and size >= max_tokens // 2 and _is_content_boundary(block):
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+
+    if overlap_tokens <= 0:
+        return [_join(chunk) for chunk in chunks]
+
+    result = []
+    previous: List[tuple] = []
+    for chunk in chunks:
+        overlap = []
+        budget = overlap_tokens
+        for unit in reversed(previous):
+            if unit[1] > budget:
+                break
+            overlap.insert(0, unit)
+            budget -= unit[1]
+        result.append(_join(overlap + chunk))
+        previous = chunk
+    return result
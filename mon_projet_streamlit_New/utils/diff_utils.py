@@ -0,0 +1,141 @@
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.chunk_utils import DEFAULT_CHUNK_TOKENS, chunk_text
+from utils.openai_utils import DEFAULT_MAX_WORKERS, AzureOpenAIClient
+from utils.pipeline_utils import run_pipeline
+
+# Index d'une version du cahier des charges :
+# empreinte du chunk -> {"rules": [...], "checkpoints": [...], "test_cases": [...], "sources": [...]}
+# ("sources" : filiation des éléments, voir run_pipeline)
+SpecIndex = Dict[str, Dict[str, List[str]]]
+
+
+def chunk_fingerprint(chunk: str) -> str:
+    """Empreinte d'un chunk, insensible aux variations d'espacement."""
+    normalized = " ".join(chunk.split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def diff_chunks(previous: SpecIndex, chunks: List[str]) -> Tuple[List[str], List[Tuple[str, str]], List[str]]:
+    """
+    Compare les chunks d'une nouvelle version à l'index de la version précédente.
+
+    Returns:
+        (empreintes inchangées, [(empreinte, chunk)] nouveaux ou modifiés, empreintes supprimées)
+    """
+    unchanged = []
+    changed = []
+    seen = set()
+    for chunk in chunks:
+        fingerprint = chunk_fingerprint(chunk)
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        if fingerprint in previous:
+            unchanged.append(fingerprint)
+        else:
+            changed.append((fingerprint, chunk))
+    removed = [fingerprint for fingerprint in previous if fingerprint not in seen]
+    return unchanged, changed, removed
+
+
+def regenerate_incrementally(
+    text: str,
+    previous: SpecIndex,
+    client: AzureOpenAIClient,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    batch_size: int = 5,
+    test_batch_size: int = 1,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    checkpoint_filter: Optional[Callable[[List[str]], List[str]]] = None
+) -> Tuple[SpecIndex, List[str], List[Dict[str, Any]]]:
+    """
+    Régénère uniquement les chunks nouveaux ou modifiés d'un cahier des charges.
+
+    Les chunks inchangés réutilisent les règles, points de contrôle et cas de test
+    de la version précédente ; les autres passent par les trois étapes de génération.
+
+    Args:
+        text: Texte de la nouvelle version
+        previous: Index de la version précédente (vide pour une première génération)
+        client: Client Azure OpenAI
+        max_workers: Nombre maximal d'appels simultanés
+        batch_size: Nombre de règles par requête de points de contrôle
+        test_batch_size: Nombre de points de contrôle par requête de cas de test
+        chunk_tokens: Budget maximal d'un chunk, en tokens
+        progress_callback: Appelée avec (résumé des étapes, terminés, total)
+        on_error: Appelée avec (élément, exception) pour chaque élément en échec
+        should_stop: Retourne True pour interrompre la génération
+        checkpoint_filter: Filtre des points de contrôle avant les cas de test (voir run_pipeline)
+
+    Returns:
+        (nouvel index, empreintes dans l'ordre du document, provenance par chunk)
+    """
+    # Frontières définies par le contenu : une modification locale ne décale pas les chunks suivants
+    chunks = chunk_text(text, max_tokens=chunk_tokens, model=client.model, content_defined=True)
+    unchanged, changed, removed = diff_chunks(previous, chunks)
+    if checkpoint_filter:
+        # Les points des chunks réutilisés alimentent le filtre : leurs paraphrases dans les
+        # chunks régénérés ne reçoivent pas de nouveaux cas de test
+        checkpoint_filter([point for fingerprint in unchanged for point in previous[fingerprint]["checkpoints"]])
+
+    # Les chunks nouveaux ou modifiés passent par le pipeline complet (étapes enchaînées en flux)
+    results, failed_positions = run_pipeline(
+        [chunk for _, chunk in changed],
+        client,
+        max_workers=max_workers,
+        rules_batch_size=batch_size,
+        test_batch_size=test_batch_size,
+        progress_callback=progress_callback,
+        on_error=on_error,
+        should_stop=should_stop,
+        checkpoint_filter=checkpoint_filter
+    )
+    fresh: SpecIndex = {fingerprint: results[position] for position, (fingerprint, _) in enumerate(changed)}
+    # Les chunks en échec ne sont pas indexés : ils seront retentés à la prochaine version
+    failed = {changed[position][0] for position in failed_positions}
+
+    # Fusion avec la version précédente, dans l'ordre du nouveau document
+    order = [chunk_fingerprint(chunk) for chunk in chunks]
+    index: SpecIndex = {}
+    provenance = []
+    unchanged_set = set(unchanged)
+    for position, fingerprint in enumerate(order, 1):
+        if fingerprint in index:
+            continue
+        if fingerprint in unchanged_set:
+            entry, status = previous[fingerprint], "inchangé"
+        elif fingerprint in failed:
+            entry, status = fresh[fingerprint], "échec"
+        else:
+            entry, status = fresh[fingerprint], "nouveau/modifié"
+        if status != "échec":
+            index[fingerprint] = entry
+        provenance.append({
+            "chunk": position,
+            "statut": status,
+            "règles": len(entry["rules"]),
+            "points": len(entry["checkpoints"]),
+            "cas de test": len(entry["test_cases"])
+        })
+    for _ in removed:
+        provenance.append({"chunk": None, "statut": "supprimé", "règles": 0, "points": 0, "cas de test": 0})
+
+    return index, order, provenance
+
+
+def merge_index(index: SpecIndex, order: List[str]) -> Dict[str, List[str]]:
+    """Aplatit l'index en listes de règles, points de contrôle et cas de test (ordre du document)."""
+    merged = {"rules": [], "checkpoints": [], "test_cases": []}
+    seen = set()
+    for fingerprint in order:
+        if fingerprint in seen or fingerprint not in index:
+            continue
+        seen.add(fingerprint)
+        for key in merged:
+            merged[key].extend(index[fingerprint][key])
+    return merged
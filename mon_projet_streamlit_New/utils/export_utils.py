@@ -0,0 +1,143 @@
+import hashlib
+import io
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.cache_utils import MemoryCache
+from utils.file_utils import export_to_excel, export_test_cases_to_excel
+
+# Formats proposés dans l'interface -> extension
+EXPORT_FORMATS = {"Word (.docx)": "docx", "Texte (.txt)": "txt", "Excel (.xlsx)": "xlsx"}
+MIME_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "txt": "text/plain",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Nombre de fichiers d'export gardés en mémoire (partagés par toutes les sessions)
+EXPORT_CACHE_SIZE = 32
+
+_exports = MemoryCache(EXPORT_CACHE_SIZE)
+
+
+def _docx_bytes(build: Callable) -> bytes:
+    from docx import Document
+    doc = Document()
+    build(doc)
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+# Exports texte datés : la date est ajoutée à chaque téléchargement, pas dans le fichier en cache
+DATED_TXT_EXPORTS = {"checkpoints", "test_cases"}
+
+
+def _with_generated_on(data: bytes) -> bytes:
+    """Insère la date de génération après la ligne de titre d'un export texte."""
+    title, _, body = data.partition(b"\n\n")
+    stamp = f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}".encode("utf-8")
+    return title + b"\n\n" + stamp + b"\n\n" + body
+
+
+def _finalize(kind: str, fmt: str, data: Optional[bytes]) -> Optional[bytes]:
+    if data is not None and fmt == "txt" and kind in DATED_TXT_EXPORTS:
+        return _with_generated_on(data)
+    return data
+
+
+def _split_existing(checkpoints: Sequence[str], existing: Sequence[str]) -> List[str]:
+    existing_set = set(existing)
+    return [p for p in checkpoints if p not in existing_set]
+
+
+def rules_docx(rules: Sequence[str], existing: Sequence[str] = ()) -> bytes:
+    def build(doc):
+        doc.add_heading('Règles de Gestion', 0)
+        for rule in rules:
+            doc.add_paragraph(rule, style='ListBullet')
+    return _docx_bytes(build)
+
+
+def rules_txt(rules: Sequence[str], existing: Sequence[str] = ()) -> bytes:
+    content = "RÈGLES DE GESTION\n\n" + "\n".join(f"{i+1}. {r}" for i, r in enumerate(rules))
+    return content.encode("utf-8")
+
+
+def checkpoints_docx(checkpoints: Sequence[str], existing: Sequence[str] = ()) -> bytes:
+    def build(doc):
+        doc.add_heading('Points de Contrôle', level=1)
+        if existing:
+            doc.add_heading('Points Existants', level=2)
+            for point in existing:
+                doc.add_paragraph(point, style='ListBullet')
+        new_points = _split_existing(checkpoints, existing)
+        if new_points:
+            doc.add_heading('Nouveaux Points', level=2)
+            for point in new_points:
+                doc.add_paragraph(point, style='ListBullet')
+    return _docx_bytes(build)
+
+
+def checkpoints_txt(checkpoints: Sequence[str], existing: Sequence[str] = ()) -> bytes:
+    content = "POINTS DE CONTRÔLE\n\n"
+    if existing:
+        content += "=== POINTS EXISTANTS ===\n"
+        content += "\n".join(f"• {p}" for p in existing) + "\n\n"
+    new_points = _split_existing(checkpoints, existing)
+    if new_points:
+        content += "=== NOUVEAUX POINTS ===\n"
+        content += "\n".join(f"• {p}" for p in new_points)
+    return content.encode("utf-8")
+
+
+def test_cases_docx(test_cases: Sequence, existing: Sequence[str] = ()) -> bytes:
+    def build(doc):
+        doc.add_heading('Cas de Test', level=1)
+        for i, test_case in enumerate(test_cases, 1):
+            doc.add_paragraph(f"Cas de test {i}", style='Heading2')
+            doc.add_paragraph(test_case.plain)
+    return _docx_bytes(build)
+
+
+def test_cases_txt(test_cases: Sequence, existing: Sequence[str] = ()) -> bytes:
+    content = "CAS DE TEST\n\n"
+    content += "\n\n".join(f"=== CAS DE TEST {i+1} ===\n{case.plain}" for i, case in enumerate(test_cases))
+    return content.encode("utf-8")
+
+
+# (contenu, format) -> fonction de construction (éléments, points existants) -> octets
+BUILDERS: Dict[Tuple[str, str], Callable[..., bytes]] = {
+    ("rules", "docx"): rules_docx,
+    ("rules", "txt"): rules_txt,
+    ("rules", "xlsx"): lambda rules, existing=(): export_to_excel(rules, "Regles_gestion").getvalue(),
+    ("checkpoints", "docx"): checkpoints_docx,
+    ("checkpoints", "txt"): checkpoints_txt,
+    ("checkpoints", "xlsx"): lambda points, existing=(): export_to_excel(points, "Points_de_controle").getvalue(),
+    ("test_cases", "docx"): test_cases_docx,
+    ("test_cases", "txt"): test_cases_txt,
+    ("test_cases", "xlsx"): lambda cases, existing=(): export_test_cases_to_excel(cases).getvalue(),
+}
+
+
+def export_key(kind: str, fmt: str, items: Iterable, existing: Iterable[str] = ()) -> str:
+    """Empreinte du contenu exporté : toute modification des éléments invalide le fichier."""
+    digest = hashlib.sha1(f"{kind}\x1f{fmt}".encode("utf-8"))
+    for item in items:
+        digest.update(b"\x1e" + getattr(item, "markdown", item).encode("utf-8"))
+    digest.update(b"\x1d")
+    for item in existing:
+        digest.update(b"\x1e" + item.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_export(kind: str, fmt: str, items: Sequence, existing: Sequence[str] = ()) -> Optional[bytes]:
+    """Fichier déjà construit pour ce contenu, ou None."""
+    return _finalize(kind, fmt, _exports.get(export_key(kind, fmt, items, existing)))
+
+
+def build_export(kind: str, fmt: str, items: Sequence, existing: Sequence[str] = ()) -> bytes:
+    """Construit (ou retrouve) le fichier d'export de ce contenu dans ce format."""
+    return _finalize(kind, fmt, _exports.get_or_compute(
+        export_key(kind, fmt, items, existing),
+        lambda: BUILDERS[(kind, fmt)](items, existing)
+    ))
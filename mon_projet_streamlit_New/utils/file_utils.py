@@ -1,99 +1,381 @@
 import fitz  # PyMuPDF
-import docx
-from typing import List
-import pandas as pd
-from io import BytesIO
+import hashlib
+import multiprocessing
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union
+from io import BytesIO, StringIO
 import re
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extrait le texte d'un fichier PDF."""
-    text = ""
-    with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
-
-def extract_text_from_docx(file_path: str) -> str:
-    """Extrait le texte d'un fichier Word."""
-    doc = docx.Document(file_path)
-    return "\n".join([para.text for para in doc.paragraphs])
-
-def extract_text_from_txt(file_path: str) -> str:
-    """Extrait le texte d'un fichier TXT."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
-
-def process_uploaded_file(file_path: str) -> str:
-    """Traite le fichier uploadé selon son type."""
-    if file_path.endswith(".pdf"):
-        return extract_text_from_pdf(file_path)
-    elif file_path.endswith(".docx"):
-        return extract_text_from_docx(file_path)
-    elif file_path.endswith(".txt"):
-        return extract_text_from_txt(file_path)
+from utils.cache_utils import MemoryCache
+from utils.testcase_utils import TestCase
+
+# Document fourni par chemin, par contenu brut ou par objet fichier (ex. UploadedFile de Streamlit)
+DocumentSource = Union[str, bytes, BinaryIO]
+
+# En deçà, le démarrage des processus coûte plus cher que l'extraction elle-même
+PDF_PARALLEL_MIN_PAGES = 64
+# Nombre de pages traitées par tâche du pool
+PDF_PAGES_PER_TASK = 32
+# Nombre de documents dont le texte extrait reste en mémoire
+EXTRACTION_CACHE_SIZE = 16
+
+_extraction_cache = MemoryCache(EXTRACTION_CACHE_SIZE)
+# Document ouvert par chaque processus du pool d'extraction PDF
+_worker_source: Union[str, bytes, None] = None
+
+def read_source(source: DocumentSource) -> bytes:
+    """Retourne le contenu brut d'un document (chemin, octets ou objet fichier)."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+def detect_file_type(data: bytes) -> str:
+    """Détermine le type d'un document ("pdf", "docx" ou "txt") d'après ses premiers octets."""
+    if data.startswith(b"%PDF"):
+        return "pdf"
+    if data.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(BytesIO(data)) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
     else:
-        raise ValueError("Type de fichier non supporté. Veuillez uploader un PDF, DOCX ou TXT.")
+        try:
+            data.decode("utf-8")
+            return "txt"
+        except UnicodeDecodeError:
+            pass
+    raise ValueError("Type de fichier non supporté. Veuillez uploader un PDF, DOCX ou TXT.")
 
-def export_to_excel(data: List[str], sheet_name: str = "Data") -> BytesIO:
-    """Convertit une liste de textes en fichier Excel."""
-    output = BytesIO()
-    df = pd.DataFrame(data, columns=["Contenu"])
+def _open_pdf(source: Union[str, bytes]):
+    if isinstance(source, bytes):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def _init_pdf_worker(source: Union[str, bytes]) -> None:
+    """Reçoit le document une fois par processus, plutôt qu'à chaque plage de pages."""
+    global _worker_source
+    _worker_source = source
+
+def _extract_page_range(start: int, stop: int) -> List[str]:
+    """Extrait le texte des pages [start, stop[ (exécuté dans un processus du pool)."""
+    with _open_pdf(_worker_source) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+def iter_pdf_pages(source: DocumentSource, max_workers: Optional[int] = None) -> Iterator[str]:
+    """
+    Produit le texte des pages d'un PDF, dans l'ordre, au fur et à mesure de l'extraction.
     
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
-        worksheet = writer.sheets[sheet_name]
-        worksheet.set_column('A:A', 50)  # Ajuste la largeur de colonne
+    Les gros documents sont découpés en plages de pages réparties sur un pool de
+    processus (chacun ouvre le document) ; les petits sont lus directement.
     
-    output.seek(0)
-    return output
+    Args:
+        source: Chemin, contenu ou objet fichier du PDF
+        max_workers: Nombre de processus (par défaut, nombre de cœurs ; 1 pour désactiver)
+    """
+    if not isinstance(source, str):
+        source = read_source(source)
+    workers = max_workers or os.cpu_count() or 1
+    with _open_pdf(source) as doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            for page in doc:
+                yield page.get_text()
+            return
+    
+    starts = list(range(0, page_count, PDF_PAGES_PER_TASK))
+    stops = [min(start + PDF_PAGES_PER_TASK, page_count) for start in starts]
+    workers = min(workers, len(starts))
+    # "spawn" : pas de fork d'un serveur multi-thread
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_pdf_worker,
+        initargs=(source,)
+    )
+    try:
+        for texts in pool.map(_extract_page_range, starts, stops):
+            yield from texts
+    finally:
+        pool.shutdown(cancel_futures=True)
 
-def export_test_cases_to_excel(test_cases: List[str]) -> BytesIO:
-    """Exporte les cas de test structurés vers Excel."""
-    output = BytesIO()
+def extract_text_from_pdf(source: DocumentSource, max_workers: Optional[int] = None) -> str:
+    """Extrait le texte d'un fichier PDF (en parallèle pour les gros documents)."""
+    return "".join(iter_pdf_pages(source, max_workers))
+
+# Espace de noms WordprocessingML
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_DOCX_HEADER_PART = re.compile(r"^word/header\d*\.xml$")
+
+class DocxBlock(NamedTuple):
+    """Bloc de texte d'un document Word : "header", "heading", "paragraph" ou "table"."""
+    kind: str
+    text: str
+    level: int = 0  # niveau de titre (1 = plus haut), 0 hors titres
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == _W + "t":
+            parts.append(node.text or "")
+        elif node.tag == _W + "tab":
+            parts.append("\t")
+        elif node.tag in (_W + "br", _W + "cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+# Niveaux hiérarchiques Word des titres (0 à 8) ; 9 est le niveau "Corps de texte"
+DOCX_OUTLINE_LEVELS = range(9)
+
+def _heading_level(paragraph: ET.Element) -> int:
+    """Niveau de titre d'un paragraphe (niveau hiérarchique ou style Titre N), 0 sinon."""
+    properties = paragraph.find(_W + "pPr")
+    if properties is None:
+        return 0
+    outline = properties.find(_W + "outlineLvl")
+    if outline is not None:
+        try:
+            level = int(outline.get(_W + "val", "0"))
+        except ValueError:
+            return 0
+        return level + 1 if level in DOCX_OUTLINE_LEVELS else 0
+    style = properties.find(_W + "pStyle")
+    name = style.get(_W + "val", "") if style is not None else ""
+    if not name.lower().startswith(("heading", "titre", "title")):
+        return 0
+    digits = "".join(char for char in name if char.isdigit())
+    return int(digits) if digits else 1
+
+def _iter_part_blocks(stream: BinaryIO, paragraph_kind: str = "paragraph") -> Iterator[DocxBlock]:
+    """
+    Parcourt une partie XML en un seul passage (iterparse), dans l'ordre du document.
     
-    # Préparation des données
-    data = []
-    for i, test_case in enumerate(test_cases, 1):
-        case_data = {
-            "ID": f"TEST-{i}",
-            "Titre": "",
-            "Préconditions": "",
-            "Données d'entrée": "",
-            "Étapes": "",
-            "Résultat attendu": ""
-        }
+    Les tableaux sont restitués ligne par ligne, cellules séparées par " | " ;
+    un tableau imbriqué est aplati dans sa cellule. Les éléments traités sont
+    libérés au fil de l'eau.
+    """
+    paragraph_depth = 0
+    table_depth = 0
+    rows: List[str] = []
+    cells: List[List[str]] = []  # cellules en cours, une liste par tableau ouvert
+    cell_parts: List[List[str]] = []
+    for event, element in ET.iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == _W + "p":
+                paragraph_depth += 1
+            elif tag == _W + "tbl":
+                table_depth += 1
+                cells.append([])
+            elif tag == _W + "tc":
+                cell_parts.append([])
+            continue
         
-        # Extraction des sections
-        sections = re.split(r'###\s+', test_case)
-        for section in sections:
-            if "Titre" in section:
-                case_data["Titre"] = section.replace("Titre", "").strip()
-            elif "Préconditions" in section:
-                case_data["Préconditions"] = section.replace("Préconditions", "").strip()
-            elif "Données d'entrée" in section:
-                case_data["Données d'entrée"] = section.replace("Données d'entrée", "").strip()
-            elif "Étapes" in section:
-                case_data["Étapes"] = section.replace("Étapes", "").strip()
-            elif "Résultat attendu" in section:
-                case_data["Résultat attendu"] = section.replace("Résultat attendu", "").strip()
-        
-        data.append(case_data)
+        if tag == _W + "p":
+            paragraph_depth -= 1
+            # Un paragraphe contenu dans un autre (zone de texte) est lu avec son parent
+            if paragraph_depth:
+                continue
+            text = _paragraph_text(element)
+            if table_depth:
+                if cell_parts:
+                    cell_parts[-1].append(text)
+            else:
+                level = _heading_level(element)
+                yield DocxBlock("heading" if level else paragraph_kind, text, level)
+                element.clear()
+        elif tag == _W + "tc" and cell_parts:
+            cells[-1].append("\n".join(part for part in cell_parts.pop() if part))
+        elif tag == _W + "tr" and cells:
+            row = " | ".join(cells[-1])
+            cells[-1] = []
+            if table_depth == 1:
+                rows.append(row)
+            elif cell_parts:
+                cell_parts[-1].append(row)
+        elif tag == _W + "tbl":
+            table_depth -= 1
+            cells.pop()
+            if not table_depth:
+                yield DocxBlock("table", "\n".join(rows))
+                rows = []
+                element.clear()
+
+def iter_docx_blocks(source: DocumentSource) -> Iterator[DocxBlock]:
+    """
+    Produit les blocs d'un document Word sans construire le modèle objet de python-docx.
     
-    # Création du DataFrame
-    df = pd.DataFrame(data)
+    Les en-têtes de page (dédoublonnés) viennent en premier, puis le corps :
+    titres, paragraphes et tableaux dans l'ordre du document.
+    """
+    if not isinstance(source, str):
+        source = BytesIO(read_source(source))
+    with zipfile.ZipFile(source) as archive:
+        seen = set()
+        for name in sorted(n for n in archive.namelist() if _DOCX_HEADER_PART.match(n)):
+            with archive.open(name) as part:
+                for block in _iter_part_blocks(part, "header"):
+                    if block.text.strip() and block.text not in seen:
+                        seen.add(block.text)
+                        yield block
+        with archive.open("word/document.xml") as part:
+            yield from _iter_part_blocks(part)
+
+def extract_text_from_docx(source: DocumentSource) -> str:
+    """Extrait le texte d'un fichier Word (en-têtes, paragraphes et tableaux)."""
+    return "\n".join(block.text for block in iter_docx_blocks(source))
+
+def extract_text_from_txt(source: DocumentSource) -> str:
+    """Extrait le texte d'un fichier TXT (fins de ligne normalisées en \\n)."""
+    text = read_source(source).decode("utf-8")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+class ExtractedDocument(NamedTuple):
+    """
+    Texte extrait d'un document, position de début de chaque page (PDF uniquement)
+    et titres connus par leur style, avec leur niveau (DOCX utilisant des styles de
+    titre ; None sinon).
+    """
+    text: str
+    page_offsets: List[int]
+    headings: Optional[Dict[str, int]] = None
+
+def _extract_docx_document(data: bytes) -> ExtractedDocument:
+    lines = []
+    headings: Dict[str, int] = {}
+    for block in iter_docx_blocks(data):
+        lines.append(block.text)
+        if block.level and block.text.strip():
+            headings.setdefault(block.text.strip(), block.level)
+    return ExtractedDocument("\n".join(lines), [], headings or None)
+
+def _extract_pdf_document(data: bytes) -> ExtractedDocument:
+    pages = list(iter_pdf_pages(data))
+    offsets = []
+    position = 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page)
+    return ExtractedDocument("".join(pages), offsets)
+
+def extract_document(source: DocumentSource) -> ExtractedDocument:
+    """
+    Extrait un document selon son type, détecté d'après son contenu.
     
-    # Écriture Excel
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name="Cas_de_test", index=False)
-        
-        # Formatage
-        workbook = writer.book
-        worksheet = writer.sheets["Cas_de_test"]
-        
-        # Ajustement des largeurs de colonnes
-        for i, col in enumerate(df.columns):
-            max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.set_column(i, i, max_len)
+    Le résultat est mis en cache par empreinte du contenu : un même document
+    (rerun, nouvel upload) n'est extrait qu'une fois.
+    """
+    data = read_source(source)
+    file_type = detect_file_type(data)
+    
+    def extract():
+        if file_type == "pdf":
+            return _extract_pdf_document(data)
+        if file_type == "docx":
+            return _extract_docx_document(data)
+        return ExtractedDocument(extract_text_from_txt(data), [])
+    
+    return _extraction_cache.get_or_compute(hashlib.sha256(data).hexdigest(), extract)
+
+def process_uploaded_file(source: DocumentSource) -> str:
+    """Traite le fichier uploadé selon son type (voir extract_document)."""
+    return extract_document(source).text
+
+# Ligne de point de contrôle : "Vérifier …", "S'assurer …", puce ou numéro en tête de ligne
+CHECKPOINT_LINE_PATTERN = re.compile(r"^(Vérifier|S['’]?assurer|Verifier|►|•|\d+[.)])\s+", re.IGNORECASE)
+
+_checkpoints_cache = MemoryCache(EXTRACTION_CACHE_SIZE)
+
+def iter_checkpoint_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Produit, en un seul passage, les points de contrôle débarrassés de leur préfixe."""
+    for line in lines:
+        line = line.strip()
+        match = CHECKPOINT_LINE_PATTERN.match(line)
+        if match and match.end() < len(line):
+            yield line[match.end():]
+
+def extract_checkpoints(source: DocumentSource) -> List[str]:
+    """
+    Extrait les points de contrôle d'un fichier existant (PDF, DOCX ou TXT).
+    
+    Le texte passe par la même extraction que les cahiers des charges ; le
+    résultat est mis en cache par empreinte du contenu.
+    """
+    data = read_source(source)
+    points = _checkpoints_cache.get_or_compute(
+        hashlib.sha256(data).hexdigest(),
+        lambda: list(iter_checkpoint_lines(StringIO(process_uploaded_file(data))))
+    )
+    return list(points)
+
+# Largeur maximale d'une colonne Excel
+MAX_COLUMN_WIDTH = 255
+
+def write_excel_rows(
+    rows: Iterable[Sequence[Any]],
+    headers: List[str],
+    sheet_name: str = "Data",
+    column_widths: Optional[List[float]] = None
+) -> BytesIO:
+    """
+    Écrit des lignes dans un classeur Excel au fil de l'eau (xlsxwriter, mode constant_memory).
+    
+    Les lignes peuvent venir d'un générateur : chacune est écrite puis libérée.
+    Sans largeurs imposées, la largeur de chaque colonne est suivie pendant
+    l'écriture (plus longue valeur + 2, comme avant).
     
+    Args:
+        rows: Lignes de valeurs, dans l'ordre des en-têtes
+        headers: En-têtes de colonnes
+        sheet_name: Nom de la feuille
+        column_widths: Largeurs fixes des colonnes (facultatif)
+    
+    Returns:
+        Fichier Excel en mémoire, positionné au début
+    """
+    import xlsxwriter
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    # Même style d'en-tête que pandas.DataFrame.to_excel
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    worksheet.write_row(0, 0, headers, header_format)
+    
+    widths = [len(header) for header in headers]
+    for row_number, row in enumerate(rows, 1):
+        for column, value in enumerate(row):
+            value = "" if value is None else str(value)
+            worksheet.write_string(row_number, column, value)
+            if len(value) > widths[column]:
+                widths[column] = len(value)
+    
+    for column, width in enumerate(column_widths or [width + 2 for width in widths]):
+        worksheet.set_column(column, column, min(width, MAX_COLUMN_WIDTH))
+    workbook.close()
     output.seek(0)
-    return output
\ No newline at end of file
+    return output
+
+def export_to_excel(data: List[str], sheet_name: str = "Data") -> BytesIO:
+    """Convertit une liste de textes en fichier Excel."""
+    return write_excel_rows(([item] for item in data), ["Contenu"], sheet_name, column_widths=[50])
+
+TEST_CASE_COLUMNS = ["ID", "Titre", "Préconditions", "Données d'entrée", "Étapes", "Résultat attendu"]
+
+def _test_case_rows(test_cases: Iterable[TestCase]) -> Iterator[List[str]]:
+    """Une ligne Excel par cas de test, produite à la demande (identifiant généré à défaut de celui du modèle)."""
+    for i, case in enumerate(test_cases, 1):
+        yield [case.id or f"TEST-{i}", case.title, case.preconditions, case.inputs, case.steps, case.expected]
+
+def export_test_cases_to_excel(test_cases: Iterable[TestCase]) -> BytesIO:
+    """Exporte les cas de test structurés vers Excel, ligne par ligne."""
+    return write_excel_rows(_test_case_rows(test_cases), TEST_CASE_COLUMNS, "Cas_de_test")
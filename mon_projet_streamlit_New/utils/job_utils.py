@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils.openai_utils import StreamEvent
+
+# Statuts d'une tâche
+PENDING = "en attente"
+RUNNING = "en cours"
+DONE = "terminé"
+FAILED = "échec"
+CANCELLED = "annulé"
+
+# Durée de conservation des tâches terminées (secondes)
+JOB_TTL = 3600
+
+# Nombre de tâches exécutées simultanément sur le serveur, toutes sessions confondues
+# (surchargeable par variable d'environnement) ; les suivantes attendent leur tour
+DEFAULT_JOB_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", "16"))
+
+
+class Job:
+    """
+    Tâche de génération exécutée en arrière-plan.
+
+    La progression, les résultats partiels (regroupés par indice d'élément) et
+    les erreurs sont mis à jour par le thread de travail et lus par l'interface
+    à chaque rerun. Toutes les lectures/écritures passent par un verrou.
+    """
+
+    def __init__(self, session_id: str, stage: str):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.stage = stage
+        self.status = PENDING
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.errors: List[Exception] = []
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        self.applied = False
+        self.created = time.time()
+        self.ended: Optional[float] = None
+        self._buckets: Dict[int, List[Any]] = {}
+        self._count = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (PENDING, RUNNING)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Demande l'arrêt de la tâche (pris en compte entre deux éléments)."""
+        self._cancel.set()
+
+    def set_progress(self, done: int, total: int, message: str = "") -> None:
+        with self._lock:
+            self.done, self.total = done, total
+            if message:
+                self.message = message
+
+    def add_value(self, index: int, value: Any) -> None:
+        with self._lock:
+            self._buckets.setdefault(index, []).append(value)
+            self._count += 1
+
+    def add_error(self, error: Exception, index: Optional[int] = None) -> None:
+        """Enregistre une erreur ; les valeurs partielles de l'élément concerné sont écartées."""
+        with self._lock:
+            self.errors.append(error)
+            if index is not None:
+                self._count -= len(self._buckets.pop(index, []))
+
+    @property
+    def count(self) -> int:
+        """Nombre de valeurs reçues jusqu'ici."""
+        return self._count
+
+    def values(self) -> List[Any]:
+        """Valeurs reçues jusqu'ici, dans l'ordre des éléments d'entrée."""
+        with self._lock:
+            return [value for index in sorted(self._buckets) for value in self._buckets[index]]
+
+    def latest(self, n: int) -> List[Any]:
+        """Dernières valeurs reçues (dans l'ordre des éléments)."""
+        return self.values()[-n:]
+
+
+def run_stream(job: Job, events: Iterator[StreamEvent]) -> List[Any]:
+    """Consomme un flux de `dispatch_stream` en alimentant la tâche ; retourne les valeurs ordonnées."""
+    done = 0
+    try:
+        for event in events:
+            if job.cancelled:
+                break
+            if event.error is not None:
+                job.add_error(event.error, event.index)
+            elif event.finished:
+                done += 1
+                job.set_progress(done, event.total)
+            else:
+                job.add_value(event.index, event.value)
+    finally:
+        # Ferme le générateur : les éléments non démarrés sont annulés
+        close = getattr(events, "close", None)
+        if close:
+            close()
+    return job.values()
+
+
+class JobRegistry:
+    """
+    Registre des tâches de génération, partagé par toutes les sessions du serveur.
+
+    Une seule tâche active par (session, étape) : soumettre à nouveau la même
+    étape pendant qu'elle tourne retourne la tâche existante. Au-delà de
+    `max_workers` tâches en cours, les nouvelles restent en attente.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, stage: str, target: Callable[[Job], Any]) -> Job:
+        """
+        Lance `target(job)` en arrière-plan ; sa valeur de retour devient `job.result`.
+        """
+        with self._lock:
+            self._purge()
+            current = self.latest(session_id, stage)
+            if current is not None and current.active:
+                return current
+            job = Job(session_id, stage)
+            self._jobs[job.id] = job
+
+        def run() -> None:
+            if job.cancelled:
+                # Annulée pendant son attente : la tâche ne démarre pas
+                job.status, job.ended = CANCELLED, time.time()
+                return
+            job.status = RUNNING
+            try:
+                job.result = target(job)
+                job.status = CANCELLED if job.cancelled else DONE
+            except Exception as e:
+                job.error = e
+                job.status = FAILED
+            finally:
+                job.ended = time.time()
+
+        self._executor.submit(run)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs_for(self, session_id: str) -> List[Job]:
+        """Tâches d'une session, de la plus ancienne à la plus récente."""
+        jobs = [job for job in list(self._jobs.values()) if job.session_id == session_id]
+        return sorted(jobs, key=lambda job: job.created)
+
+    def waiting_before(self, job: Job) -> int:
+        """Nombre de tâches en attente soumises avant `job` (toutes sessions)."""
+        return sum(1 for other in list(self._jobs.values())
+                   if other.status == PENDING and other.created < job.created)
+
+    def latest(self, session_id: str, stage: str) -> Optional[Job]:
+        """Dernière tâche d'une session pour une étape donnée."""
+        jobs = [job for job in self.jobs_for(session_id) if job.stage == stage]
+        return jobs[-1] if jobs else None
+
+    def _purge(self) -> None:
+        """Oublie les tâches terminées depuis plus de JOB_TTL secondes."""
+        limit = time.time() - JOB_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.ended and job.ended < limit]:
+            del self._jobs[job_id]
@@ -0,0 +1,73 @@
+import os
+import threading
+from typing import Any, Callable, Dict, List
+
+# Modèles chargés à la demande (jamais à l'import)
+SPACY_MODEL = "fr_core_news_sm"
+SEMANTIC_MODEL = os.environ.get("SEMANTIC_MODEL", "fr_core_news_md")
+
+_models: Dict[str, Any] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def load_once(name: str, loader: Callable[[], Any]) -> Any:
+    """
+    Retourne la ressource `name`, chargée par `loader` au premier appel seulement.
+
+    Le registre est global au processus : toutes les sessions Streamlit partagent
+    les mêmes modèles. Deux threads qui demandent la même ressource en même temps
+    attendent un unique chargement.
+    """
+    if name in _models:
+        return _models[name]
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _models:
+            _models[name] = loader()
+    return _models[name]
+
+
+def loaded_models() -> List[str]:
+    """Noms des ressources déjà chargées dans ce processus."""
+    return list(_models)
+
+
+def _load_spacy(model: str, **kwargs):
+    import spacy
+    try:
+        return spacy.load(model, **kwargs)
+    except OSError as e:
+        raise OSError(
+            f"Modèle spaCy '{model}' introuvable. Installez-le avec : python -m spacy download {model}"
+        ) from e
+
+
+def get_nlp():
+    """Pipeline spaCy français (fr_core_news_sm)."""
+    return load_once("spacy", lambda: _load_spacy(SPACY_MODEL))
+
+
+def get_semantic_model():
+    """Modèle de plongements (seuls les vecteurs sont utiles), ou à défaut le pipeline `get_nlp()`."""
+    def load():
+        try:
+            return _load_spacy(SEMANTIC_MODEL, exclude=["tok2vec", "morphologizer", "parser", "senter",
+                                                        "attribute_ruler", "lemmatizer", "ner"])
+        except OSError:
+            return get_nlp()
+    return load_once("semantic", load)
+
+
+def get_french_stopwords() -> frozenset:
+    """Mots vides français de NLTK ; le corpus n'est téléchargé que s'il est absent."""
+    def load():
+        import nltk
+        from nltk.corpus import stopwords
+        try:
+            return frozenset(stopwords.words('french'))
+        except LookupError:
+            nltk.download('stopwords', quiet=True)
+            return frozenset(stopwords.words('french'))
+    return load_once("stopwords", load)
@@ -1,125 +1,655 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from typing import List
+import queue
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+from utils.cache_utils import ResponseCache, make_cache_key
+from utils.chunk_utils import DEFAULT_CHUNK_TOKENS, chunk_text
 
-def split_text(text: str, chunk_size: int = 4000) -> List[str]:
-    """Découpe le texte en morceaux."""
-    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+# Nombre maximal de requêtes simultanées vers l'API
+DEFAULT_MAX_WORKERS = 8
 
-def generate_rules(text: str, api_key: str, endpoint: str, model: str) -> List[str]:
-    """Génère les règles de gestion avec OpenAI."""
-    chunks = split_text(text)
-    all_rules = []
-    
-    for chunk in tqdm(chunks, desc="Génération des règles"):
-        url = f"{endpoint}/openai/deployments/{model}/chat/completions?api-version=2024-02-15-preview"
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": api_key
-        }
-        prompt = (
-            "À partir du texte suivant du cahier des charges, génère une liste claire et concise de règles de gestion métier. "
-            "Chaque règle doit être numérotée et rédigée de manière exploitable pour un analyste ou développeur. "
-            "Base-toi uniquement sur le contenu :\n\n"
-            f"{chunk}"
-        )
-        payload = {
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.3,
-            "max_tokens": 3000
-        }
-        
+# Taille du pool de connexions HTTP (doit couvrir le nombre de requêtes simultanées)
+DEFAULT_POOL_SIZE = 32
+
+API_VERSION = "2024-02-15-preview"
+
+# Politique de nouvelle tentative
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+DEFAULT_MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Versions des prompts : à incrémenter à chaque modification d'un prompt pour invalider le cache
+RULES_PROMPT_VERSION = "rules-v1"
+CHECKPOINTS_PROMPT_VERSION = "checkpoints-v1"
+TEST_CASES_PROMPT_VERSION = "test-cases-v1"
+TEST_CASES_BATCH_PROMPT_VERSION = "test-cases-batch-v2"
+
+# Budget de sortie par point de contrôle en mode groupé, et plafond d'une réponse
+TEST_CASE_TOKENS = 800
+BATCH_MAX_TOKENS = 4096
+
+
+class TruncatedResponseError(Exception):
+    """Réponse interrompue par la limite max_tokens."""
+
+
+class IncompleteStreamError(Exception):
+    """Flux de réponse terminé sans l'événement [DONE] (connexion coupée)."""
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Retourne le délai (en secondes) demandé par le serveur, s'il est indiqué."""
+    value = headers.get("retry-after-ms")
+    if value:
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            rules_text = response.json()["choices"][0]["message"]["content"]
-            all_rules.extend(rules_text.split('\n'))
-        except Exception as e:
-            print(f"Erreur lors de la génération des règles : {e}")
-    
-    return [rule.strip() for rule in all_rules if rule.strip()]
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
 
-def generate_checkpoints(rules: List[str], api_key: str, endpoint: str, model: str) -> List[str]:
-    """Génère les points de contrôle à partir des règles."""
-    checkpoints = []
-    batch_size = 5
-    
-    progress_bar = tqdm(total=len(rules), desc="Génération des points de contrôle")
-    
-    for i in range(0, len(rules), batch_size):
-        batch = rules[i:i + batch_size]
-        batch_text = "\n".join(batch)
-        
-        url = f"{endpoint}/openai/deployments/{model}/chat/completions?api-version=2024-02-15-preview"
-        headers = {
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # Format date HTTP
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    """Lit un en-tête numérique, None s'il est absent ou invalide."""
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Délai exponentiel avec gigue complète pour la tentative `attempt` (0, 1, ...)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveLimiter:
+    """
+    Limite adaptative du nombre de requêtes en vol.
+
+    La limite augmente d'une unité par « fenêtre » de succès et est divisée par deux
+    à chaque 429 (AIMD). Elle est aussi abaissée lorsque les en-têtes
+    x-ratelimit-remaining-* indiquent que le quota de la minute est presque épuisé.
+    Après un 429, toutes les requêtes attendent le délai imposé par le serveur.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def on_success(self, headers: Mapping[str, str], token_cost: int) -> None:
+        """Ajuste la limite selon le quota restant annoncé par le serveur."""
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        with self._cond:
+            limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if remaining_requests is not None:
+                limit = min(limit, remaining_requests)
+            if remaining_tokens is not None and token_cost > 0:
+                limit = min(limit, remaining_tokens // token_cost)
+            self.limit = max(float(self.min_concurrency), limit)
+            self._cond.notify_all()
+
+    def on_throttle(self, delay: float) -> None:
+        """Réduit la limite de moitié et suspend les envois pendant `delay` secondes."""
+        with self._cond:
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+
+
+class AzureOpenAIClient:
+    """
+    Client Azure OpenAI réutilisant une session HTTP persistante.
+
+    L'URL et les en-têtes sont construits une seule fois par endpoint/modèle,
+    et les connexions TLS sont conservées (keep-alive) entre les requêtes.
+    La session est partagée entre les threads du dispatcher.
+
+    Les erreurs transitoires (429, 5xx, coupures réseau) sont retentées avec un
+    backoff exponentiel, en respectant Retry-After, et le nombre de requêtes
+    simultanées s'adapte au quota de la ressource Azure.
+
+    Si un cache est fourni, les réponses déjà obtenues pour le même modèle,
+    la même version de prompt et les mêmes paramètres sont servies sans appel réseau.
+    """
+
+    def __init__(self, api_key: str, endpoint: str, model: str,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: int = 30,
+                 max_retries: int = DEFAULT_MAX_RETRIES, cache: Optional[ResponseCache] = None):
+        self.model = model
+        self.cache = cache
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter(pool_size)
+        self.url = f"{endpoint.rstrip('/')}/openai/deployments/{model}/chat/completions?api-version={API_VERSION}"
+
+        self.session = requests.Session()
+        self.session.headers.update({
             "Content-Type": "application/json",
             "api-key": api_key
-        }
-        prompt = (
-            "À partir des règles de gestion suivantes, génère une liste de points de contrôle. "
-            "Chaque point doit commencer par un verbe d'action comme : Vérifier que..., S'assurer que..., Contrôler si..., etc.\n\n"
-            f"{batch_text}\n\n"
-            "Format attendu :\n"
-            "1. [Point de contrôle]\n"
-            "2. [Point de contrôle]\n"
-            "..."
-        )
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def chat(self, prompt: str, max_tokens: int, temperature: float = 0.3,
+             prompt_version: str = "", json_mode: bool = False,
+             require_complete: bool = False) -> str:
+        """
+        Envoie un prompt au modèle et retourne le contenu de la réponse.
+
+        Avec `json_mode`, le modèle est contraint de répondre en JSON. Avec
+        `require_complete`, une réponse tronquée par max_tokens lève
+        TruncatedResponseError au lieu d'être retournée (et n'est pas mise en cache).
+        """
+        key = None
+        if self.cache is not None:
+            key = make_cache_key(self.model, prompt_version, temperature, max_tokens, prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
         payload = {
             "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.3,
-            "max_tokens": 2000
+            "temperature": temperature,
+            "max_tokens": max_tokens
         }
-        
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            cp_text = response.json()["choices"][0]["message"]["content"]
-            checkpoints.extend([line.strip() for line in cp_text.split('\n') if line.strip()])
-            progress_bar.update(len(batch))
-        except Exception as e:
-            print(f"Erreur lors de la génération des points de contrôle : {e}")
-    
-    progress_bar.close()
-    return checkpoints
-
-def generate_test_cases(checkpoints: List[str], api_key: str, endpoint: str, model: str) -> List[str]:
-    """Génère les cas de test détaillés."""
-    test_cases = []
-    
-    progress_bar = tqdm(total=len(checkpoints), desc="Génération des cas de test")
-    
-    for cp in checkpoints:
-        url = f"{endpoint}/openai/deployments/{model}/chat/completions?api-version=2024-02-15-preview"
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": api_key
-        }
-        prompt = (
-            f"À partir du point de contrôle suivant et il faut savoir qu'un point de contrôle peut contenir plusieurs cas de test, alors il faut générer tout les cas de test de ce point de contrôle :\n'{cp}'\n"
-            "Génère un cas de test détaillé avec les éléments suivants :\n"
-            "### ID du test\n"
-            "### Titre\n"
-            "### Préconditions\n"
-            "### Données d'entrée\n"
-            "### Étapes\n"
-            "### Résultat attendu\n\n"
-            "Formate la réponse en Markdown."
-        )
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        response = self._post(payload)
+        choice = response.json()["choices"][0]
+        content = choice["message"]["content"]
+        if require_complete and choice.get("finish_reason") == "length":
+            raise TruncatedResponseError(f"Réponse tronquée à {max_tokens} tokens")
+
+        if key is not None:
+            self.cache.put(key, content)
+        return content
+
+    def stream_chat(self, prompt: str, max_tokens: int, temperature: float = 0.3,
+                    prompt_version: str = "") -> Iterator[str]:
+        """
+        Envoie un prompt en mode streaming (server-sent events) et produit les
+        fragments de texte au fil de leur réception.
+
+        Partage le cache de `chat` : une réponse en cache est produite d'un bloc, et
+        une réponse reçue entièrement est mise en cache. Un flux interrompu avant
+        [DONE] lève IncompleteStreamError.
+        """
+        key = None
+        if self.cache is not None:
+            key = make_cache_key(self.model, prompt_version, temperature, max_tokens, prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
         payload = {
             "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.3,
-            "max_tokens": 1000
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
         }
-        
+        response = self._post(payload, stream=True)
+        parts = []
+        completed = False
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            test_case = response.json()["choices"][0]["message"]["content"]
-            test_cases.append(test_case)
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    completed = True
+                    break
+                # Azure envoie d'abord un événement de filtrage sans "choices"
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            response.close()
+
+        if not completed:
+            # Les valeurs déjà produites sont partielles : l'élément doit être signalé en échec
+            raise IncompleteStreamError("Flux interrompu avant la fin de la réponse")
+        if key is not None:
+            self.cache.put(key, "".join(parts))
+
+    def _post(self, payload: dict, stream: bool = False) -> requests.Response:
+        """Envoie la requête en réessayant les erreurs transitoires."""
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                with self.limiter:
+                    response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            if response.status_code not in RETRYABLE_STATUS or last_attempt:
+                response.raise_for_status()
+                self.limiter.on_success(response.headers, payload.get("max_tokens", 0))
+                return response
+
+            delay = parse_retry_after(response.headers)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            else:
+                # Petite gigue pour éviter que tous les threads repartent ensemble
+                delay += random.uniform(0, BACKOFF_BASE)
+            if response.status_code == 429:
+                self.limiter.on_throttle(delay)
+            response.close()
+            time.sleep(delay)
+
+    def close(self) -> None:
+        """Ferme les connexions du pool."""
+        self.session.close()
+
+
+class DispatchResult(NamedTuple):
+    """Résultat d'un élément traité par le dispatcher."""
+    index: int
+    item: Any
+    value: Any = None
+    error: Optional[Exception] = None
+
+
+def dispatch(
+    func: Callable[[Any], Any],
+    items: List[Any],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    desc: str = "",
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[DispatchResult]:
+    """
+    Exécute `func` sur chaque élément avec au plus `max_workers` appels en parallèle.
+
+    Args:
+        func: Fonction appliquée à chaque élément
+        items: Éléments à traiter
+        max_workers: Nombre maximal d'appels simultanés
+        desc: Libellé de la barre de progression console
+        progress_callback: Appelée avec (terminés, total) après chaque élément,
+            toujours depuis le thread appelant (compatible Streamlit)
+
+    Returns:
+        Un résultat par élément, dans l'ordre des entrées, avec l'erreur éventuelle
+    """
+    total = len(items)
+    results: List[Optional[DispatchResult]] = [None] * total
+    if not total:
+        return []
+
+    progress_bar = tqdm(total=total, desc=desc)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as executor:
+        futures = {executor.submit(func, item): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = DispatchResult(i, items[i], value=future.result())
+            except Exception as e:
+                results[i] = DispatchResult(i, items[i], error=e)
             progress_bar.update(1)
-        except Exception as e:
-            print(f"Erreur lors de la génération du cas de test pour '{cp[:30]}...': {e}")
-    
+            if progress_callback:
+                progress_callback(done, total)
     progress_bar.close()
-    return test_cases
\ No newline at end of file
+
+    return results
+
+
+class StreamEvent(NamedTuple):
+    """Événement produit par dispatch_stream : une valeur, une erreur ou la fin d'un élément."""
+    index: int
+    total: int
+    value: Any = None
+    error: Optional[Exception] = None
+    finished: bool = False
+
+
+def dispatch_stream(
+    func: Callable[[Any], Iterator[Any]],
+    items: List[Any],
+    max_workers: int = DEFAULT_MAX_WORKERS
+) -> Iterator[StreamEvent]:
+    """
+    Variante de `dispatch` pour les fonctions qui produisent plusieurs valeurs.
+
+    Les valeurs sont émises dès qu'elles sont produites, dans l'ordre d'arrivée
+    (l'ordre est conservé au sein d'un même élément). Chaque élément se termine par
+    un événement `finished`, précédé d'un événement `error` en cas d'échec. Les
+    événements sont produits dans le thread appelant (compatible Streamlit).
+    """
+    total = len(items)
+    if not total:
+        return
+    events: "queue.Queue[StreamEvent]" = queue.Queue()
+
+    def run(i: int, item: Any) -> None:
+        try:
+            for value in func(item):
+                events.put(StreamEvent(i, total, value=value))
+        except Exception as e:
+            events.put(StreamEvent(i, total, error=e))
+        finally:
+            events.put(StreamEvent(i, total, finished=True))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total)))
+    try:
+        for i, item in enumerate(items):
+            executor.submit(run, i, item)
+        remaining = total
+        while remaining:
+            event = events.get()
+            if event.finished:
+                remaining -= 1
+            yield event
+    finally:
+        # Si le consommateur s'arrête en cours de route, les éléments non démarrés sont annulés
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_lines(fragments: Iterator[str]) -> Iterator[str]:
+    """Recompose des lignes complètes (non vides) à partir de fragments de texte."""
+    buffer = ""
+    for fragment in fragments:
+        buffer += fragment
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield line.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def _report_errors(results: List[DispatchResult], message: Callable[[Any], str],
+                   on_error: Optional[Callable[[Any, Exception], None]]) -> None:
+    """Signale chaque élément en échec (console par défaut)."""
+    for result in results:
+        if result.error is None:
+            continue
+        if on_error:
+            on_error(result.item, result.error)
+        else:
+            print(f"{message(result.item)} : {result.error}")
+
+
+def _rules_prompt(chunk: str) -> str:
+    return (
+        "À partir du texte suivant du cahier des charges, génère une liste claire et concise de règles de gestion métier. "
+        "Chaque règle doit être numérotée et rédigée de manière exploitable pour un analyste ou développeur. "
+        "Base-toi uniquement sur le contenu :\n\n"
+        f"{chunk}"
+    )
+
+
+def _checkpoints_prompt(batch: List[str]) -> str:
+    batch_text = "\n".join(batch)
+    return (
+        "À partir des règles de gestion suivantes, génère une liste de points de contrôle. "
+        "Chaque point doit commencer par un verbe d'action comme : Vérifier que..., S'assurer que..., Contrôler si..., etc.\n\n"
+        f"{batch_text}\n\n"
+        "Format attendu :\n"
+        "1. [Point de contrôle]\n"
+        "2. [Point de contrôle]\n"
+        "..."
+    )
+
+
+def rules_from_chunk(client: AzureOpenAIClient, chunk: str) -> List[str]:
+    """Génère les règles de gestion d'un morceau de texte (un appel)."""
+    rules_text = client.chat(_rules_prompt(chunk), max_tokens=3000, prompt_version=RULES_PROMPT_VERSION)
+    return [rule.strip() for rule in rules_text.split('\n') if rule.strip()]
+
+
+def stream_rules_from_chunk(client: AzureOpenAIClient, chunk: str) -> Iterator[str]:
+    """Comme rules_from_chunk, mais produit chaque règle dès que sa ligne est complète."""
+    return iter_lines(client.stream_chat(_rules_prompt(chunk), max_tokens=3000, prompt_version=RULES_PROMPT_VERSION))
+
+
+def checkpoints_from_rules(client: AzureOpenAIClient, batch: List[str]) -> List[str]:
+    """Génère les points de contrôle d'un lot de règles (un appel)."""
+    cp_text = client.chat(_checkpoints_prompt(batch), max_tokens=2000, prompt_version=CHECKPOINTS_PROMPT_VERSION)
+    return [line.strip() for line in cp_text.split('\n') if line.strip()]
+
+
+def stream_checkpoints_from_rules(client: AzureOpenAIClient, batch: List[str]) -> Iterator[str]:
+    """Comme checkpoints_from_rules, mais produit chaque point dès que sa ligne est complète."""
+    return iter_lines(client.stream_chat(_checkpoints_prompt(batch), max_tokens=2000,
+                                         prompt_version=CHECKPOINTS_PROMPT_VERSION))
+
+
+def test_case_from_checkpoint(client: AzureOpenAIClient, cp: str) -> str:
+    """Génère le cas de test Markdown d'un point de contrôle (un appel)."""
+    prompt = (
+        f"À partir du point de contrôle suivant et il faut savoir qu'un point de contrôle peut contenir plusieurs cas de test, alors il faut générer tout les cas de test de ce point de contrôle :\n'{cp}'\n"
+        "Génère un cas de test détaillé avec les éléments suivants :\n"
+        "### ID du test\n"
+        "### Titre\n"
+        "### Préconditions\n"
+        "### Données d'entrée\n"
+        "### Étapes\n"
+        "### Résultat attendu\n\n"
+        "Formate la réponse en Markdown."
+    )
+    return client.chat(prompt, max_tokens=1000, prompt_version=TEST_CASES_PROMPT_VERSION)
+
+
+def _parse_batched_test_cases(content: str, expected: int) -> List[str]:
+    """Extrait les cas de test d'une réponse JSON groupée, dans l'ordre des points de contrôle."""
+    data = json.loads(content)
+    items = data["cas_de_test"] if isinstance(data, dict) else data
+    # Un point de contrôle peut donner plusieurs cas de test : toutes ses entrées sont conservées
+    by_index: Dict[int, List[str]] = {}
+    for item in items:
+        markdown = item["markdown"].strip()
+        if markdown:
+            by_index.setdefault(int(item["index"]), []).append(markdown)
+    missing = [i for i in range(1, expected + 1) if i not in by_index]
+    if missing:
+        raise ValueError(f"Cas de test manquants pour les points {missing}")
+    return ["\n\n".join(by_index[i]) for i in range(1, expected + 1)]
+
+
+def test_cases_from_checkpoints(client: AzureOpenAIClient, batch: List[str]) -> List[str]:
+    """
+    Génère les cas de test de plusieurs points de contrôle en un seul appel.
+
+    La réponse est demandée en JSON puis redécoupée par point de contrôle. Si elle
+    est tronquée ou incomplète, le lot est coupé en deux et chaque moitié est
+    retentée, jusqu'à revenir au prompt unitaire pour un point isolé.
+    """
+    if len(batch) == 1:
+        return [test_case_from_checkpoint(client, batch[0])]
+
+    numbered = "\n".join(f"{i}. {cp}" for i, cp in enumerate(batch, 1))
+    prompt = (
+        "Pour chacun des points de contrôle numérotés suivants (un point de contrôle peut contenir plusieurs cas de test, "
+        "il faut générer tous les cas de test de chaque point) :\n"
+        f"{numbered}\n\n"
+        "Génère un cas de test détaillé avec les éléments suivants, en Markdown :\n"
+        "### ID du test\n"
+        "### Titre\n"
+        "### Préconditions\n"
+        "### Données d'entrée\n"
+        "### Étapes\n"
+        "### Résultat attendu\n\n"
+        "Réponds uniquement avec un objet JSON de la forme "
+        '{"cas_de_test": [{"index": <numéro du point>, "markdown": "<cas de test en Markdown>"}]}, '
+        "avec au moins une entrée par point de contrôle (une entrée par cas de test)."
+    )
+    try:
+        content = client.chat(
+            prompt,
+            max_tokens=min(TEST_CASE_TOKENS * len(batch), BATCH_MAX_TOKENS),
+            prompt_version=TEST_CASES_BATCH_PROMPT_VERSION,
+            json_mode=True,
+            require_complete=True
+        )
+        return _parse_batched_test_cases(content, len(batch))
+    except requests.HTTPError as e:
+        # Déploiement sans support de response_format (anciens gpt-35-turbo) : prompt unitaire
+        if e.response is None or e.response.status_code != 400:
+            raise
+        return [test_case_from_checkpoint(client, cp) for cp in batch]
+    except (TruncatedResponseError, ValueError, KeyError, TypeError, AttributeError):
+        middle = len(batch) // 2
+        return test_cases_from_checkpoints(client, batch[:middle]) + \
+            test_cases_from_checkpoints(client, batch[middle:])
+
+
+def generate_rules(
+    text: str,
+    api_key: str,
+    endpoint: str,
+    model: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    client: Optional[AzureOpenAIClient] = None,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS
+) -> List[str]:
+    """Génère les règles de gestion avec OpenAI."""
+    client = client or AzureOpenAIClient(api_key, endpoint, model)
+    chunks = chunk_text(text, max_tokens=chunk_tokens, model=client.model)
+
+    results = dispatch(lambda chunk: rules_from_chunk(client, chunk), chunks,
+                       max_workers, "Génération des règles", progress_callback)
+    _report_errors(results, lambda chunk: "Erreur lors de la génération des règles", on_error)
+
+    return [rule for result in results if result.error is None for rule in result.value]
+
+
+def generate_checkpoints(
+    rules: List[str],
+    api_key: str,
+    endpoint: str,
+    model: str,
+    batch_size: int = 5,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    client: Optional[AzureOpenAIClient] = None
+) -> List[str]:
+    """Génère les points de contrôle à partir des règles."""
+    client = client or AzureOpenAIClient(api_key, endpoint, model)
+    batches = [rules[i:i + batch_size] for i in range(0, len(rules), batch_size)]
+
+    results = dispatch(lambda batch: checkpoints_from_rules(client, batch), batches,
+                       max_workers, "Génération des points de contrôle", progress_callback)
+    _report_errors(results, lambda batch: "Erreur lors de la génération des points de contrôle", on_error)
+
+    return [cp for result in results if result.error is None for cp in result.value]
+
+
+def generate_test_cases(
+    checkpoints: List[str],
+    api_key: str,
+    endpoint: str,
+    model: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    client: Optional[AzureOpenAIClient] = None,
+    batch_size: int = 1
+) -> List[str]:
+    """
+    Génère les cas de test détaillés.
+
+    Avec `batch_size` > 1, plusieurs points de contrôle sont envoyés par requête
+    (voir test_cases_from_checkpoints) ; la progression et les erreurs sont alors
+    rapportées par lot.
+    """
+    client = client or AzureOpenAIClient(api_key, endpoint, model)
+
+    if batch_size <= 1:
+        results = dispatch(lambda cp: test_case_from_checkpoint(client, cp), checkpoints,
+                           max_workers, "Génération des cas de test", progress_callback)
+        _report_errors(results, lambda cp: f"Erreur lors de la génération du cas de test pour '{cp[:30]}...'", on_error)
+        return [result.value for result in results if result.error is None]
+
+    batches = [checkpoints[i:i + batch_size] for i in range(0, len(checkpoints), batch_size)]
+    results = dispatch(lambda batch: test_cases_from_checkpoints(client, batch), batches,
+                       max_workers, "Génération des cas de test", progress_callback)
+    _report_errors(results, lambda batch: f"Erreur lors de la génération des cas de test pour '{batch[0][:30]}...'", on_error)
+    return [tc for result in results if result.error is None for tc in result.value]
+
+
+def stream_rules(
+    text: str,
+    client: AzureOpenAIClient,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS
+) -> Iterator[StreamEvent]:
+    """Génère les règles de gestion en les produisant au fil de l'eau (un élément par chunk)."""
+    chunks = chunk_text(text, max_tokens=chunk_tokens, model=client.model)
+    return dispatch_stream(lambda chunk: stream_rules_from_chunk(client, chunk), chunks, max_workers)
+
+
+def stream_checkpoints(
+    rules: List[str],
+    client: AzureOpenAIClient,
+    batch_size: int = 5,
+    max_workers: int = DEFAULT_MAX_WORKERS
+) -> Iterator[StreamEvent]:
+    """Génère les points de contrôle en les produisant au fil de l'eau (un élément par lot de règles)."""
+    batches = [rules[i:i + batch_size] for i in range(0, len(rules), batch_size)]
+    return dispatch_stream(lambda batch: stream_checkpoints_from_rules(client, batch), batches, max_workers)
+
+
+def stream_test_cases(
+    checkpoints: List[str],
+    client: AzureOpenAIClient,
+    batch_size: int = 1,
+    max_workers: int = DEFAULT_MAX_WORKERS
+) -> Iterator[StreamEvent]:
+    """Génère les cas de test en produisant chaque cas dès que sa requête (ou son lot) aboutit."""
+    batches = [checkpoints[i:i + batch_size] for i in range(0, len(checkpoints), max(1, batch_size))]
+    return dispatch_stream(lambda batch: iter(test_cases_from_checkpoints(client, batch)), batches, max_workers)
@@ -0,0 +1,206 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.openai_utils import (
+    DEFAULT_MAX_WORKERS,
+    AzureOpenAIClient,
+    rules_from_chunk,
+    checkpoints_from_rules,
+    test_cases_from_checkpoints
+)
+
+# Taille des files entre étapes : au-delà, l'étape amont attend (contre-pression)
+DEFAULT_QUEUE_SIZE = 32
+# Intervalle de vérification de l'interruption pendant l'attente d'une place dans une file
+QUEUE_POLL_INTERVAL = 0.5
+
+_END = object()
+
+
+def run_pipeline(
+    chunks: List[str],
+    client: AzureOpenAIClient,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    rules_batch_size: int = 5,
+    test_batch_size: int = 1,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    on_value: Optional[Callable[[str, Tuple[int, ...], List[str]], None]] = None,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    checkpoint_filter: Optional[Callable[[List[str]], List[str]]] = None
+) -> Tuple[List[Dict[str, List[str]]], Set[int]]:
+    """
+    Enchaîne règles -> points de contrôle -> cas de test en flux continu.
+
+    Chaque étape dispose de ses propres threads et consomme une file bornée
+    alimentée par l'étape précédente : les points de contrôle d'un chunk sont
+    demandés dès que ses règles sont connues, sans attendre les autres chunks.
+    Quand une file est pleine, l'étape amont attend (contre-pression). L'ordre du
+    document est rétabli à la fin grâce aux clés (chunk, lot, sous-lot).
+
+    Args:
+        chunks: Morceaux du cahier des charges
+        client: Client Azure OpenAI (son limiteur borne les requêtes réellement en vol)
+        max_workers: Nombre de threads par étape
+        rules_batch_size: Nombre de règles par requête de points de contrôle
+        test_batch_size: Nombre de points de contrôle par requête de cas de test
+        queue_size: Capacité des files entre étapes
+        progress_callback: Appelée avec (résumé, requêtes terminées, requêtes connues)
+        on_value: Appelée avec (étape, clé, valeurs) à chaque résultat intermédiaire
+        on_error: Appelée avec (élément, exception) pour chaque requête en échec
+        should_stop: Retourne True pour interrompre le pipeline
+        checkpoint_filter: Retourne, pour chaque lot de points de contrôle, ceux qui recevront
+            des cas de test (ex. `SemanticIndex.filter_new` pour écarter les paraphrases) ;
+            les points écartés restent dans les résultats
+
+    Returns:
+        (résultats par chunk, indices des chunks en échec). Chaque résultat contient
+        "rules", "checkpoints", "test_cases" et "sources" : la filiation des éléments
+        sous forme de [nature, élément, nature du parent, parent]. Les points de contrôle
+        sont générés par lot de règles, sans indiquer la règle dont chacun est issu : ils
+        ont pour parent le lot ("rule_batch", identifiant propre au chunk), qui a pour
+        parents ses règles ; un cas de test a pour parent son point de contrôle. Les
+        règles sont issues du chunk.
+    """
+    rules_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    checkpoints_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+
+    rules: Dict[Tuple[int, ...], List[str]] = {}
+    checkpoints: Dict[Tuple[int, ...], List[str]] = {}
+    test_cases: Dict[Tuple[int, ...], List[str]] = {}
+    sources: Dict[Tuple[int, ...], List[List[str]]] = {}
+    failed: Set[int] = set()
+    # Requêtes terminées / connues par étape
+    counters = {"rules": [0, len(chunks)], "checkpoints": [0, 0], "test_cases": [0, 0]}
+
+    def stopped() -> bool:
+        return bool(should_stop and should_stop())
+
+    def record(stage: str, store: Dict, key: Tuple[int, ...], values: List[str], produced: int = 0,
+               downstream: Optional[str] = None) -> None:
+        with lock:
+            store[key] = values
+            counters[stage][0] += 1
+            if downstream:
+                counters[downstream][1] += produced
+            snapshot = {name: tuple(count) for name, count in counters.items()}
+        if on_value:
+            on_value(stage, key, values)
+        if progress_callback:
+            done = sum(count[0] for count in snapshot.values())
+            total = sum(count[1] for count in snapshot.values())
+            summary = (f"Règles {snapshot['rules'][0]}/{snapshot['rules'][1]} • "
+                       f"Points {snapshot['checkpoints'][0]}/{snapshot['checkpoints'][1]} • "
+                       f"Cas {snapshot['test_cases'][0]}/{snapshot['test_cases'][1]}")
+            progress_callback(summary, done, total)
+
+    def fail(stage: str, key: Tuple[int, ...], item: Any, error: Exception) -> None:
+        with lock:
+            failed.add(key[0])
+            counters[stage][0] += 1
+        if on_error:
+            on_error(item, error)
+
+    def put(target: "queue.Queue", item: Any) -> bool:
+        """Ajoute à la file dès qu'une place se libère ; False si le pipeline est interrompu entre-temps."""
+        while not stopped():
+            try:
+                target.put(item, timeout=QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    # Chaque élément est traité entièrement sous try : une exception (appel LLM, filtre,
+    # callback) le marque en échec sans tuer le thread, qui continue à vider sa file
+    def rules_stage(index: int) -> None:
+        if stopped():
+            return
+        try:
+            values = rules_from_chunk(client, chunks[index])
+            batches = [values[i:i + rules_batch_size] for i in range(0, len(values), rules_batch_size)]
+            record("rules", rules, (index,), values, len(batches), "checkpoints")
+            for b, batch in enumerate(batches):
+                if not put(rules_queue, ((index, b), batch)):
+                    return
+        except Exception as e:
+            fail("rules", (index,), chunks[index], e)
+
+    def checkpoints_stage() -> None:
+        while True:
+            item = rules_queue.get()
+            if item is _END:
+                return
+            key, batch = item
+            if stopped():
+                continue
+            try:
+                values = checkpoints_from_rules(client, batch)
+                # La liste des points est conservée entière : seuls les cas de test sont filtrés
+                to_test = checkpoint_filter(values) if checkpoint_filter else values
+                sub_batches = [to_test[i:i + test_batch_size] for i in range(0, len(to_test), test_batch_size)]
+                record("checkpoints", checkpoints, key, values, len(sub_batches), "test_cases")
+                batch_id = f"{key[0]}.{key[1]}"
+                with lock:
+                    sources[key] = ([["rule_batch", batch_id, "rule", rule] for rule in batch]
+                                    + [["checkpoint", point, "rule_batch", batch_id] for point in values])
+                for s, sub_batch in enumerate(sub_batches):
+                    if not put(checkpoints_queue, (key + (s,), sub_batch)):
+                        break
+            except Exception as e:
+                fail("checkpoints", key, batch, e)
+
+    def test_cases_stage() -> None:
+        while True:
+            item = checkpoints_queue.get()
+            if item is _END:
+                return
+            key, batch = item
+            if stopped():
+                continue
+            try:
+                values = test_cases_from_checkpoints(client, batch)
+                record("test_cases", test_cases, key, values)
+                # Un cas de test par point de contrôle du sous-lot, dans l'ordre
+                with lock:
+                    sources[key] = [["test_case", case, "checkpoint", point] for case, point in zip(values, batch)]
+            except Exception as e:
+                fail("test_cases", key, batch, e)
+
+    workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix="pipeline") as consumers:
+        checkpoint_workers = [consumers.submit(checkpoints_stage) for _ in range(workers)]
+        test_case_workers = [consumers.submit(test_cases_stage) for _ in range(workers)]
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline-rules") as producers:
+            list(producers.map(rules_stage, range(len(chunks))))
+
+        # Fin de flux : chaque étape se termine quand l'étape amont a fini
+        for _ in checkpoint_workers:
+            rules_queue.put(_END)
+        for future in checkpoint_workers:
+            future.result()
+        for _ in test_case_workers:
+            checkpoints_queue.put(_END)
+        for future in test_case_workers:
+            future.result()
+
+    results = [{"rules": rules.get((index,), []), "checkpoints": [], "test_cases": [], "sources": []}
+               for index in range(len(chunks))]
+    for name, store in (("checkpoints", checkpoints), ("test_cases", test_cases), ("sources", sources)):
+        for key in sorted(store):
+            results[key[0]][name].extend(store[key])
+    return results, failed
+
+
+def flatten_results(results: List[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """Concatène les résultats par chunk en trois listes, dans l'ordre du document."""
+    merged = {"rules": [], "checkpoints": [], "test_cases": []}
+    for entry in results:
+        for key in merged:
+            merged[key].extend(entry[key])
+    return merged
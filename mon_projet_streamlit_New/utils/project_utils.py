@@ -0,0 +1,313 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils.testcase_utils import parse_test_case_markdown
+
+# Emplacement par défaut de la base des projets (surchargeable par variable d'environnement)
+DEFAULT_PROJECT_PATH = os.environ.get(
+    "PROJECT_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "testing_factory", "projects.sqlite")
+)
+# Nombre de lignes lues par requête lors du chargement d'une liste
+DEFAULT_PAGE_SIZE = 500
+ITEM_KINDS = ("rules", "checkpoints", "test_cases")
+# Origine des résultats par bloc : index incrémental, pipeline complet (clé = empreinte de chunk)
+# ou génération par section (clé = id de section)
+CHUNK_SOURCES = ("spec", "pipeline", "section")
+# Arête de filiation : (nature, élément, nature du parent, parent). Chaîne enregistrée :
+# "chunk"/"section" -> "rule" -> "rule_batch" (lot de règles envoyé en une requête) ->
+# "checkpoint" -> "test_case" ; le modèle ne dit pas de quelle règle du lot vient un point
+LineageRow = Tuple[str, str, str, str]
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS documents ("
+    " id TEXT PRIMARY KEY,"
+    " name TEXT NOT NULL,"
+    " text TEXT NOT NULL,"
+    " page_offsets TEXT,"
+    " headings TEXT,"
+    " created REAL NOT NULL,"
+    " updated REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_documents_updated ON documents(updated)",
+    # Résultats par chunk (clé = empreinte) ou par section (clé = id de section)
+    "CREATE TABLE IF NOT EXISTS chunks ("
+    " document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,"
+    " source TEXT NOT NULL,"
+    " key TEXT NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " results TEXT NOT NULL,"
+    " PRIMARY KEY (document_id, source, key))",
+    "CREATE TABLE IF NOT EXISTS rules ("
+    " document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,"
+    " position INTEGER NOT NULL,"
+    " text TEXT NOT NULL,"
+    " PRIMARY KEY (document_id, position))",
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    " document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,"
+    " position INTEGER NOT NULL,"
+    " text TEXT NOT NULL,"
+    " existing INTEGER NOT NULL DEFAULT 0,"
+    " PRIMARY KEY (document_id, position))",
+    "CREATE INDEX IF NOT EXISTS idx_checkpoints_existing ON checkpoints(document_id, existing, position)",
+    "CREATE TABLE IF NOT EXISTS test_cases ("
+    " document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,"
+    " position INTEGER NOT NULL,"
+    " text TEXT NOT NULL,"
+    " PRIMARY KEY (document_id, position))",
+    # Filiation chunk/section -> règle -> lot de règles -> point de contrôle -> cas de test (voir LineageRow)
+    "CREATE TABLE IF NOT EXISTS lineage ("
+    " document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,"
+    " kind TEXT NOT NULL,"
+    " item TEXT NOT NULL,"
+    " parent_kind TEXT NOT NULL,"
+    " parent TEXT NOT NULL,"
+    " PRIMARY KEY (document_id, kind, item, parent_kind, parent))",
+    "CREATE INDEX IF NOT EXISTS idx_lineage_parent ON lineage(document_id, parent_kind, parent)",
+)
+
+
+def lineage_rows(blocks: Iterable[Tuple[str, str, Dict[str, List[str]]]]) -> Iterator[LineageRow]:
+    """
+    Arêtes de filiation des résultats par bloc.
+
+    Args:
+        blocks: (nature du bloc, clé, résultats), par exemple ("chunk", empreinte, entrée
+            de l'index) ou ("section", id, résultats de la section)
+    """
+    for block_kind, key, entry in blocks:
+        for rule in entry["rules"]:
+            yield "rule", rule, block_kind, key
+        for kind, item, parent_kind, parent in entry.get("sources", []):
+            # Les identifiants de lot sont propres au bloc
+            if kind == "rule_batch":
+                item = f"{key}#{item}"
+            if parent_kind == "rule_batch":
+                parent = f"{key}#{parent}"
+            if kind == "test_case":
+                # Une réponse peut contenir plusieurs cas de test : chacun a pour parent le point
+                for case in parse_test_case_markdown(item):
+                    yield kind, case.markdown, parent_kind, parent
+            else:
+                yield kind, item, parent_kind, parent
+
+
+class StoredDocument(NamedTuple):
+    id: str
+    name: str
+    text: str
+    page_offsets: Optional[List[int]]
+    headings: Optional[Dict[str, int]]  # titres connus par leur style (DOCX), voir index_sections
+
+
+class ProjectSummary(NamedTuple):
+    """Projet enregistré, avec le nombre d'éléments de chaque type."""
+    id: str
+    name: str
+    updated: float
+    rules: int
+    checkpoints: int
+    test_cases: int
+
+
+class ProjectStore:
+    """
+    Base persistante des projets (SQLite) : documents, résultats par chunk et par
+    section, règles, points de contrôle, cas de test et filiation des éléments.
+
+    Un projet est identifié par l'empreinte du texte du document : le même cahier
+    des charges retrouve ses résultats, d'une session ou d'un analyste à l'autre.
+    Une seule connexion est partagée entre les threads, protégée par un verrou.
+    """
+
+    def __init__(self, path: str = DEFAULT_PROJECT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    def save_document(self, document_id: str, name: str, text: str,
+                      page_offsets: Optional[List[int]] = None,
+                      headings: Optional[Dict[str, int]] = None) -> None:
+        """
+        Enregistre le document s'il est nouveau, sinon met seulement à jour son nom.
+
+        Les titres DOCX sont conservés pour reconstruire à l'identique l'arbre des
+        sections (et donc les ids des résultats par section) à la réouverture.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO documents (id, name, text, page_offsets, headings, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET name = excluded.name",
+                (document_id, name, text, json.dumps(page_offsets) if page_offsets else None,
+                 json.dumps(headings, ensure_ascii=False) if headings else None, now, now)
+            )
+
+    def get_document(self, document_id: str) -> Optional[StoredDocument]:
+        """Retourne le document enregistré, ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, text, page_offsets, headings FROM documents WHERE id = ?", (document_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredDocument(row[0], row[1], row[2], json.loads(row[3]) if row[3] else None,
+                              json.loads(row[4]) if row[4] else None)
+
+    def _summaries(self, condition: str = "", params: tuple = ()) -> List[ProjectSummary]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.id, d.name, d.updated,"
+                " (SELECT COUNT(*) FROM rules WHERE document_id = d.id),"
+                " (SELECT COUNT(*) FROM checkpoints WHERE document_id = d.id),"
+                " (SELECT COUNT(*) FROM test_cases WHERE document_id = d.id)"
+                f" FROM documents d{condition} ORDER BY d.updated DESC",
+                params
+            ).fetchall()
+        return [ProjectSummary(*row) for row in rows]
+
+    def projects(self) -> List[ProjectSummary]:
+        """Projets enregistrés, du plus récemment modifié au plus ancien (sans charger les textes)."""
+        return self._summaries()
+
+    def summary(self, document_id: str) -> Optional[ProjectSummary]:
+        """Résumé d'un projet, ou None s'il n'est pas enregistré."""
+        summaries = self._summaries(" WHERE d.id = ?", (document_id,))
+        return summaries[0] if summaries else None
+
+    def save_results(
+        self,
+        document_id: str,
+        rules: Optional[Iterable[str]] = None,
+        checkpoints: Optional[Iterable[str]] = None,
+        test_cases: Optional[Iterable[str]] = None,
+        existing: Iterable[str] = (),
+        chunks: Optional[Dict[str, Dict[str, Dict[str, List[str]]]]] = None,
+        lineage: Optional[Iterable[LineageRow]] = None
+    ) -> None:
+        """
+        Remplace les résultats enregistrés d'un projet, en une seule transaction.
+
+        Seuls les résultats fournis sont remplacés (None : inchangés), de sorte que deux
+        tâches terminées sur le même projet n'effacent pas les résultats l'une de l'autre.
+
+        Args:
+            document_id: Empreinte du document (voir save_document)
+            rules: Règles de gestion
+            checkpoints: Points de contrôle (existants compris)
+            test_cases: Cas de test, au format Markdown
+            existing: Points de contrôle importés
+            chunks: Origine (voir CHUNK_SOURCES) -> résultats par bloc
+            lineage: Arêtes de filiation (voir lineage_rows)
+        """
+        existing_set = set(existing)
+        with self._lock, self._conn:
+            for table, values in (("rules", rules), ("test_cases", test_cases)):
+                if values is None:
+                    continue
+                self._conn.execute(f"DELETE FROM {table} WHERE document_id = ?", (document_id,))
+                self._conn.executemany(
+                    f"INSERT INTO {table} (document_id, position, text) VALUES (?, ?, ?)",
+                    ((document_id, position, text) for position, text in enumerate(values))
+                )
+            if checkpoints is not None:
+                self._conn.execute("DELETE FROM checkpoints WHERE document_id = ?", (document_id,))
+                self._conn.executemany(
+                    "INSERT INTO checkpoints (document_id, position, text, existing) VALUES (?, ?, ?, ?)",
+                    ((document_id, position, point, point in existing_set)
+                     for position, point in enumerate(checkpoints))
+                )
+            for source, results in (chunks or {}).items():
+                if source not in CHUNK_SOURCES:
+                    raise ValueError(f"Origine inconnue : {source}")
+                self._conn.execute("DELETE FROM chunks WHERE document_id = ? AND source = ?", (document_id, source))
+                self._conn.executemany(
+                    "INSERT INTO chunks (document_id, source, key, position, results) VALUES (?, ?, ?, ?, ?)",
+                    ((document_id, source, key, position, json.dumps(entry, ensure_ascii=False))
+                     for position, (key, entry) in enumerate(results.items()))
+                )
+            if lineage is not None:
+                self._conn.execute("DELETE FROM lineage WHERE document_id = ?", (document_id,))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO lineage (document_id, kind, item, parent_kind, parent)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    ((document_id, *row) for row in lineage)
+                )
+            self._conn.execute("UPDATE documents SET updated = ? WHERE id = ?", (time.time(), document_id))
+
+    def iter_items(self, document_id: str, kind: str, existing: Optional[bool] = None,
+                   page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[str]:
+        """
+        Parcourt les éléments d'un projet par pages, dans l'ordre d'enregistrement.
+
+        Args:
+            document_id: Empreinte du document
+            kind: "rules", "checkpoints" ou "test_cases"
+            existing: Pour les points de contrôle, ne retient que les existants (True) ou les nouveaux (False)
+            page_size: Nombre de lignes lues par requête
+        """
+        if kind not in ITEM_KINDS:
+            raise ValueError(f"Type d'élément inconnu : {kind}")
+        condition, params = "", ()
+        if existing is not None and kind == "checkpoints":
+            condition, params = " AND existing = ?", (int(existing),)
+        position = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT position, text FROM {kind} WHERE document_id = ? AND position > ?{condition}"
+                    " ORDER BY position LIMIT ?",
+                    (document_id, position, *params, page_size)
+                ).fetchall()
+            for position, text in rows:
+                yield text
+            if len(rows) < page_size:
+                return
+
+    def load_items(self, document_id: str, kind: str, existing: Optional[bool] = None) -> List[str]:
+        """Liste complète des éléments d'un type (voir iter_items)."""
+        return list(self.iter_items(document_id, kind, existing))
+
+    def parents(self, document_id: str, kind: str, item: str) -> List[Tuple[str, str]]:
+        """Parents directs d'un élément : [(nature, parent)] (une règle -> son chunk ou sa section...)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT parent_kind, parent FROM lineage WHERE document_id = ? AND kind = ? AND item = ?",
+                (document_id, kind, item)
+            ).fetchall()
+
+    def children(self, document_id: str, parent_kind: str, parent: str) -> List[Tuple[str, str]]:
+        """Éléments issus directement d'un parent : [(nature, élément)] (une règle -> ses points...)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT kind, item FROM lineage WHERE document_id = ? AND parent_kind = ? AND parent = ?",
+                (document_id, parent_kind, parent)
+            ).fetchall()
+
+    def load_chunks(self, document_id: str, source: str) -> Dict[str, Dict[str, List[str]]]:
+        """Résultats par bloc d'une origine (voir CHUNK_SOURCES), dans l'ordre d'enregistrement."""
+        if source not in CHUNK_SOURCES:
+            raise ValueError(f"Origine inconnue : {source}")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, results FROM chunks WHERE document_id = ? AND source = ? ORDER BY position",
+                (document_id, source)
+            ).fetchall()
+        return {key: json.loads(results) for key, results in rows}
+
+    def delete(self, document_id: str) -> None:
+        """Supprime un projet et tous ses résultats."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
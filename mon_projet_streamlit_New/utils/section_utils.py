@@ -0,0 +1,251 @@
+import re
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from utils.cache_utils import MemoryCache
+from utils.chunk_utils import DEFAULT_CHUNK_TOKENS, DEFAULT_MODEL, chunk_text
+from utils.openai_utils import DEFAULT_MAX_WORKERS, AzureOpenAIClient
+from utils.pipeline_utils import run_pipeline
+from utils.text_processing import text_fingerprint
+
+# Titres reconnus (une ligne courte, sans ponctuation finale)
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+\S")
+# Numérotation pointée ("2.3.1 Objet") ou "N." suivi d'un titre court commençant par une
+# majuscule : une ligne de PDF renvoyée qui commence par un nombre ("30 jours après...") n'en est pas un
+NUMBERED_HEADING = re.compile(r"^(?:(\d+(?:\.\d+)+)\.?\s+\S|(\d+)\.\s+[A-ZÀ-Ý][^.;:!?]{0,80}$)")
+KEYWORD_HEADING = re.compile(r"^(?i:(chapitre|partie|titre)|(article|section|annexe))\s+[\w.]+")
+UPPERCASE_HEADING = re.compile(r"^[A-ZÀ-Ý][A-ZÀ-Ý0-9 '’\-]{2,80}$")
+# Exigences numérotées : "RG-01", "REQ 12", "EXG_3"...
+REQUIREMENT_HEADING = re.compile(r"^(?i:RG|REQ|EXG|EF|ENF|RF|RNF)[-_ ]?\d+\b")
+MAX_HEADING_LENGTH = 120
+PREAMBLE_ID = "S0"
+
+# Résultats de génération par section : id -> {"rules": [...], "checkpoints": [...], "test_cases": [...],
+# "sources": [...]} (filiation des éléments, voir run_pipeline)
+SectionResults = Dict[str, Dict[str, List[str]]]
+
+_sections_cache = MemoryCache(8)
+
+
+class Section(NamedTuple):
+    """
+    Section du cahier des charges.
+
+    `start`/`end` délimitent dans le texte la ligne de titre et le contenu propre
+    de la section (jusqu'au titre suivant, sous-sections exclues).
+    """
+    id: str
+    title: str
+    level: int
+    kind: str  # "préambule", "titre" ou "exigence"
+    start: int
+    end: int
+    page: Optional[int]
+    parent: Optional[str]
+
+
+def heading_level(line: str, current_level: int) -> Optional[Tuple[int, str]]:
+    """Retourne (niveau, nature) si la ligne est un titre ou une exigence numérotée, sinon None."""
+    if not line or len(line) > MAX_HEADING_LENGTH:
+        return None
+    match = MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1)), "titre"
+    if REQUIREMENT_HEADING.match(line):
+        return current_level + 1, "exigence"
+    # Une phrase terminée (liste numérotée, paragraphe court) n'est pas un titre
+    if line[-1] in ".;:,":
+        return None
+    match = NUMBERED_HEADING.match(line)
+    if match:
+        return (match.group(1) or match.group(2)).count(".") + 1, "titre"
+    match = KEYWORD_HEADING.match(line)
+    if match:
+        return (1 if match.group(1) else 2), "titre"
+    if UPPERCASE_HEADING.match(line):
+        return 1, "titre"
+    return None
+
+
+def build_section_index(
+    text: str,
+    page_offsets: Optional[List[int]] = None,
+    styled_headings: Optional[Dict[str, int]] = None
+) -> List[Section]:
+    """
+    Construit l'arbre des sections (titres, exigences numérotées) du texte.
+
+    Args:
+        text: Texte extrait du cahier des charges
+        page_offsets: Position de début de chaque page dans le texte (PDF)
+        styled_headings: Titres connus par leur style et leur niveau (DOCX) ; s'il y en a,
+            seuls ces titres et les exigences numérotées ouvrent une section, sinon les
+            titres sont reconnus à leur forme (voir heading_level)
+
+    Returns:
+        Sections dans l'ordre du document ; l'arbre est porté par `level` et `parent`
+    """
+    headings = []  # (début, titre, niveau, nature)
+    current_level = 0
+    position = 0
+    for raw_line in text.splitlines(keepends=True):
+        line = raw_line.strip()
+        if not styled_headings:
+            found = heading_level(line, current_level)
+        elif line in styled_headings:
+            found = styled_headings[line], "titre"
+        elif line and len(line) <= MAX_HEADING_LENGTH and REQUIREMENT_HEADING.match(line):
+            found = current_level + 1, "exigence"
+        else:
+            found = None
+        if found:
+            level, kind = found
+            headings.append((position, line, level, kind))
+            if kind == "titre":
+                current_level = level
+        position += len(raw_line)
+
+    def page_of(offset: int) -> Optional[int]:
+        return bisect_right(page_offsets, offset) if page_offsets else None
+
+    sections = []
+    first = headings[0][0] if headings else len(text)
+    if text[:first].strip():
+        sections.append(Section(PREAMBLE_ID, "Préambule", 0, "préambule", 0, first, page_of(0), None))
+
+    stack: List[Tuple[int, str]] = []  # (niveau, id) des sections ouvertes
+    for number, (start, title, level, kind) in enumerate(headings, 1):
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        section_id = f"S{number}"
+        end = headings[number][0] if number < len(headings) else len(text)
+        sections.append(Section(section_id, title, level, kind, start, end, page_of(start),
+                                stack[-1][1] if stack else None))
+        stack.append((level, section_id))
+    return sections
+
+
+def index_sections(
+    text: str,
+    page_offsets: Optional[List[int]] = None,
+    styled_headings: Optional[Dict[str, int]] = None
+) -> List[Section]:
+    """build_section_index mis en cache par contenu (les reruns ne réanalysent pas le texte)."""
+    return _sections_cache.get_or_compute(
+        (text_fingerprint(text), bool(styled_headings)),
+        lambda: build_section_index(text, page_offsets, styled_headings)
+    )
+
+
+def section_label(section: Section) -> str:
+    """Libellé court d'une section, pour l'affichage et la traçabilité."""
+    page = f" (p. {section.page})" if section.page else ""
+    return f"{section.id} • {section.title[:80]}{page}"
+
+
+def section_chunks(
+    text: str,
+    sections: List[Section],
+    section_ids: Optional[Set[str]] = None,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    model: str = DEFAULT_MODEL
+) -> List[Tuple[str, str]]:
+    """
+    Découpe le texte section par section : une requête par section, sauf si elle
+    dépasse le budget de tokens. Les titres sans contenu propre sont ignorés (leur
+    contenu est porté par leurs sous-sections) ; une exigence tenant sur une ligne
+    est envoyée, la ligne étant l'exigence elle-même.
+
+    Returns:
+        Liste de (id de section, chunk)
+    """
+    result = []
+    for section in sections:
+        if section_ids is not None and section.id not in section_ids:
+            continue
+        body = text[section.start:section.end].strip()
+        if section.kind == "titre" and "\n" not in body:
+            continue
+        for chunk in chunk_text(body, max_tokens=max_tokens, model=model):
+            result.append((section.id, chunk))
+    return result
+
+
+def generate_by_section(
+    text: str,
+    sections: List[Section],
+    client: AzureOpenAIClient,
+    section_ids: Optional[Set[str]] = None,
+    previous: Optional[SectionResults] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    test_batch_size: int = 1,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+    on_error: Optional[Callable[[Any, Exception], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    checkpoint_filter: Optional[Callable[[List[str]], List[str]]] = None
+) -> Tuple[SectionResults, Set[str]]:
+    """
+    Génère règles, points de contrôle et cas de test section par section.
+
+    Avec `section_ids`, seules ces sections sont (re)générées ; les résultats des
+    autres sont repris de `previous`.
+
+    Returns:
+        (résultats par section, ids des sections en échec)
+    """
+    chunks = section_chunks(text, sections, section_ids, chunk_tokens, client.model)
+    if checkpoint_filter and previous and section_ids is not None:
+        # Les points des sections conservées alimentent le filtre des paraphrases
+        checkpoint_filter([point for section_id, entry in previous.items()
+                           if section_id not in section_ids for point in entry["checkpoints"]])
+    results, failed_positions = run_pipeline(
+        [chunk for _, chunk in chunks],
+        client,
+        max_workers=max_workers,
+        test_batch_size=test_batch_size,
+        progress_callback=progress_callback,
+        on_error=on_error,
+        should_stop=should_stop,
+        checkpoint_filter=checkpoint_filter
+    )
+    failed = {chunks[position][0] for position in failed_positions}
+
+    fresh: SectionResults = {}
+    for (section_id, _), entry in zip(chunks, results):
+        merged = fresh.setdefault(section_id, {"rules": [], "checkpoints": [], "test_cases": [], "sources": []})
+        for key in merged:
+            merged[key].extend(entry[key])
+
+    regenerated = {section.id for section in sections
+                   if section_ids is None or section.id in section_ids}
+    combined: SectionResults = {
+        section_id: entry for section_id, entry in (previous or {}).items() if section_id not in regenerated
+    }
+    for section_id, entry in fresh.items():
+        if section_id not in failed:
+            combined[section_id] = entry
+        elif previous and section_id in previous:
+            # Une section en échec garde ses résultats précédents
+            combined[section_id] = previous[section_id]
+    return combined, failed
+
+
+def merge_sections(results: SectionResults, sections: List[Section]) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """
+    Aplatit les résultats dans l'ordre du document.
+
+    Returns:
+        ({"rules", "checkpoints", "test_cases"}, élément -> id de sa section d'origine)
+    """
+    merged = {"rules": [], "checkpoints": [], "test_cases": []}
+    origins: Dict[str, str] = {}
+    for section in sections:
+        entry = results.get(section.id)
+        if not entry:
+            continue
+        for key in merged:
+            merged[key].extend(entry[key])
+            for item in entry[key]:
+                origins.setdefault(item, section.id)
+    return merged, origins
@@ -0,0 +1,89 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Rubriques d'un cas de test, dans l'ordre du prompt, avec les libellés acceptés
+FIELD_LABELS = {
+    "id": r"id(?:entifiant)?(?:\s+du\s+test)?",
+    "title": r"titre(?:\s+du\s+test)?",
+    "preconditions": r"pr[ée][\s-]?conditions?",
+    "inputs": r"donn[ée]es?\s+d['’]\s?entr[ée]es?",
+    "steps": r"[ée]tapes?(?:\s+de\s+test)?",
+    "expected": r"r[ée]sultats?\s+attendus?",
+}
+FIELD_NAMES = list(FIELD_LABELS)
+
+# Ligne de rubrique : "### Titre", "### **Titre**", "### 2. Étapes", "**Résultat attendu :** ...",
+# "- **Titre** : ..." ; le libellé doit correspondre exactement et n'être suivi que de "**", de ":"
+# (puis du contenu) ou de la fin de ligne : une puce "**Étape 1** : ..." ou "### Étape 2"
+# appartient à la rubrique Étapes
+SECTION_HEADING = re.compile(
+    r"^\s*(?:[-*+]\s+)?(?:#{1,6}\s*(?:\*\*)?|\*\*)\s*(?:\d+[.)]\s*(?:\*\*)?\s*)?(?:"
+    + "|".join(f"(?P<{name}>{pattern})" for name, pattern in FIELD_LABELS.items())
+    + r")\s*(?:\*\*)?\s*(?::\s*(?:\*\*)?\s*(?P<rest>.*))?$",
+    re.IGNORECASE
+)
+# Balises Markdown retirées pour les exports texte (titres et gras)
+MARKDOWN_MARKUP = re.compile(r"#+\s*|\*\*")
+
+
+class TestCase(NamedTuple):
+    """Cas de test structuré, analysé une seule fois à la génération."""
+    id: str
+    title: str
+    preconditions: str
+    inputs: str
+    steps: str
+    expected: str
+    markdown: str  # texte d'origine, pour l'affichage
+    plain: str  # texte sans balises Markdown, pour les exports DOCX/TXT
+
+
+def _build(fields: Dict[str, Optional[List[str]]], lines: List[str]) -> TestCase:
+    markdown = "\n".join(lines).strip()
+    values = {name: "\n".join(fields[name] or []).strip() for name in FIELD_NAMES}
+    return TestCase(markdown=markdown, plain=MARKDOWN_MARKUP.sub("", markdown), **values)
+
+
+def parse_test_case_markdown(markdown: str) -> List[TestCase]:
+    """
+    Analyse une réponse Markdown en un seul passage.
+
+    Une réponse peut contenir plusieurs cas de test : une rubrique déjà remplie
+    ouvre un nouveau cas. Une réponse sans rubrique reconnue donne un cas dont
+    seul le texte est renseigné.
+    """
+    lines = markdown.splitlines()
+    cases = []
+    fields: Optional[Dict[str, Optional[List[str]]]] = None
+    current = None
+    start = 0
+    heading = -1  # dernière ligne de rubrique
+    for number, line in enumerate(lines):
+        match = SECTION_HEADING.match(line)
+        if match is None:
+            if current:
+                fields[current].append(line)
+            continue
+        name = next(name for name in FIELD_NAMES if match.group(name))
+        if fields is not None and fields[name] is not None:
+            # Les titres et lignes vides qui précèdent la rubrique appartiennent au nouveau cas
+            boundary = number
+            while boundary > heading + 1 and (not lines[boundary - 1].strip() or lines[boundary - 1].lstrip().startswith("#")):
+                boundary -= 1
+            if current:
+                del fields[current][len(fields[current]) - (number - boundary):]
+            cases.append(_build(fields, lines[start:boundary]))
+            fields, start = None, boundary
+        if fields is None:
+            fields = dict.fromkeys(FIELD_NAMES)
+        rest = (match.group("rest") or "").strip()
+        fields[name] = [rest] if rest else []
+        current, heading = name, number
+    if fields is not None:
+        cases.append(_build(fields, lines[start:]))
+    return cases or [_build(dict.fromkeys(FIELD_NAMES), lines)]
+
+
+def parse_test_cases(markdowns: Iterable[str]) -> List[TestCase]:
+    """Analyse les réponses Markdown générées et retourne la liste à plat des cas de test."""
+    return [case for markdown in markdowns for case in parse_test_case_markdown(markdown)]
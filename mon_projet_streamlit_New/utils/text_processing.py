@@ -1,55 +1,117 @@
-from typing import List, Set, Dict, Tuple  # Import des types pour les annotations
+from typing import TYPE_CHECKING, List, Set, Dict, NamedTuple, Optional, Tuple  # Import des types pour les annotations
 from difflib import SequenceMatcher
 import re
 import string
-import spacy
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from collections import Counter
-import nltk
 from collections import Counter
+import zlib
+import io
+import hashlib
+import threading
+import numpy as np
+from utils.cache_utils import MemoryCache
+from utils.model_utils import get_french_stopwords, get_nlp, get_semantic_model
 
-# Téléchargements NLTK
-nltk.download('punkt')
-nltk.download('stopwords')
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
 
-# Chargement du modèle spaCy
-nlp = spacy.load("fr_core_news_sm")
+# spaCy, NLTK, wordcloud et matplotlib sont chargés au premier usage (voir utils.model_utils)
 
-def clean_text(text: str) -> List[str]:
-    """Nettoie le texte et retourne les tokens."""
-    # Mise en minuscule
-    text = text.lower()
-    
-    # Suppression des éléments indésirables
-    text = re.sub(r"\d+", " ", text)
-    text = re.sub(r"<.*?>", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    
-    # Lemmatisation et filtrage
-    doc = nlp(text)
-    cleaned_tokens = [
-        token.lemma_ for token in doc
-        if token.text not in stopwords.words('french')
-        and token.text not in string.punctuation
-        and not token.is_space
-        and len(token.text) > 2
-    ]
+# Prétraitement : seuls les lemmes sont utilisés, l'analyse syntaxique et les entités sont inutiles
+CLEAN_TEXT_DISABLED = ["parser", "ner", "senter"]
+# Taille maximale d'un morceau envoyé à spaCy (bien en deçà de max_length)
+CLEAN_TEXT_MAX_CHARS = 100_000
+_DIGITS = re.compile(r"\d+")
+_TAGS = re.compile(r"<.*?>")
+_SPACES = re.compile(r"\s+")
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+
+
+def _text_pieces(text: str, max_chars: int = CLEAN_TEXT_MAX_CHARS):
+    """Nettoie le texte par paragraphe et découpe les paragraphes trop longs sur un espace."""
+    for paragraph in _PARAGRAPHS.split(text.lower()):
+        paragraph = _SPACES.sub(" ", _TAGS.sub(" ", _DIGITS.sub(" ", paragraph))).strip()
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            yield paragraph[:cut]
+            paragraph = paragraph[cut:].lstrip()
+        if paragraph:
+            yield paragraph
+
+
+def clean_text(text: str, n_process: int = 1, batch_size: int = 64) -> List[str]:
+    """
+    Nettoie le texte et retourne les tokens.
+
+    Les paragraphes sont lemmatisés par lots avec `nlp.pipe`, sans l'analyseur
+    syntaxique ni la reconnaissance d'entités.
+
+    Args:
+        text: Texte à nettoyer
+        n_process: Nombre de processus spaCy (utile pour les très gros documents)
+        batch_size: Nombre de paragraphes par lot
+    """
+    stop_words = get_french_stopwords()
+    cleaned_tokens = []
+    for doc in get_nlp().pipe(_text_pieces(text), batch_size=batch_size, n_process=n_process,
+                        disable=CLEAN_TEXT_DISABLED):
+        cleaned_tokens.extend(
+            token.lemma_ for token in doc
+            if len(token.text) > 2
+            and token.text not in stop_words
+            and token.text not in string.punctuation
+            and not token.is_space
+        )
     return cleaned_tokens
 
-def generate_wordcloud(text: str) -> plt.Figure:
-    """Génère un nuage de mots à partir du texte."""
-    tokens = clean_text(text)
-    freq_dist = Counter(tokens)
-    
-    wordcloud = WordCloud(
+# Nombre de documents dont l'analyse reste en mémoire (partagée par toutes les sessions)
+ANALYSIS_CACHE_SIZE = 8
+_analysis_cache = MemoryCache(ANALYSIS_CACHE_SIZE)
+_wordcloud_cache = MemoryCache(ANALYSIS_CACHE_SIZE)
+
+
+class TextAnalysis(NamedTuple):
+    """Tokens nettoyés d'un document et leurs fréquences."""
+    tokens: List[str]
+    frequencies: Counter
+
+
+def text_fingerprint(text: str) -> str:
+    """Empreinte SHA-1 d'un texte, clé des caches d'analyse."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def analyze_text(text: str) -> TextAnalysis:
+    """Tokens et fréquences du texte, calculés une seule fois par contenu."""
+    def compute():
+        tokens = clean_text(text)
+        return TextAnalysis(tokens, Counter(tokens))
+    return _analysis_cache.get_or_compute(text_fingerprint(text), compute)
+
+
+def _build_wordcloud(frequencies: Counter):
+    from wordcloud import WordCloud
+    return WordCloud(
         width=800, 
         height=400, 
         background_color='white',
         colormap='viridis'
-    ).generate_from_frequencies(freq_dist)
+    ).generate_from_frequencies(frequencies)
+
+
+def wordcloud_image(text: str) -> bytes:
+    """Image PNG du nuage de mots, rendue une seule fois par contenu."""
+    def compute():
+        buffer = io.BytesIO()
+        _build_wordcloud(analyze_text(text).frequencies).to_image().save(buffer, format="PNG")
+        return buffer.getvalue()
+    return _wordcloud_cache.get_or_compute(text_fingerprint(text), compute)
+
+
+def generate_wordcloud(text: str) -> "Figure":
+    """Génère un nuage de mots à partir du texte."""
+    import matplotlib.pyplot as plt
+    wordcloud = _build_wordcloud(analyze_text(text).frequencies)
     
     fig, ax = plt.subplots(figsize=(10, 5))
     ax.imshow(wordcloud, interpolation='bilinear')
@@ -60,25 +122,190 @@ def is_similar(text1: str, text2: str, threshold: float = 0.85) -> bool:
     """Détermine si deux textes sont similaires."""
     return SequenceMatcher(None, text1.lower(), text2.lower()).ratio() >= threshold
 
-def remove_duplicates(new_items: List[str], existing_items: List[str]) -> List[str]:
+# Paramètres MinHash / LSH : 32 bandes de 4 lignes (seuil de Jaccard ≈ 0,42 sur les 4-grammes)
+SHINGLE_SIZE = 4
+LSH_BANDS = 32
+LSH_ROWS = 4
+# Fonctions de hachage multiply-add-shift : ((a * h + b) mod 2^64) >> 32, a impair
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(0, 1 << 62, size=LSH_BANDS * LSH_ROWS, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 62, size=LSH_BANDS * LSH_ROWS, dtype=np.int64).astype(np.uint64)
+
+
+def _minhash_signature(text: str) -> np.ndarray:
+    """Signature MinHash des 4-grammes de caractères d'un texte (minuscules, espaces normalisés)."""
+    text = " ".join(text.split())
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(sh.encode("utf-8")) for sh in shingles), dtype=np.uint64, count=len(shingles))
+    # Le débordement modulo 2^64 est voulu
+    with np.errstate(over="ignore"):
+        return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) >> np.uint64(32)).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    Index LSH des textes conservés, pour trouver les candidats quasi-doublons.
+
+    Les candidats partagent au moins une bande de leur signature MinHash ;
+    ils sont ensuite vérifiés avec le ratio exact de SequenceMatcher.
+    """
+
+    def __init__(self, threshold: float = 0.85):
+        self.threshold = threshold
+        self.texts: List[str] = []
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def _bands(self, signature: np.ndarray):
+        for band in range(LSH_BANDS):
+            yield band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+
+    def find_similar(self, text: str, signature: np.ndarray) -> Optional[int]:
+        """Retourne l'indice d'un texte indexé similaire à `text` (en minuscules), ou None."""
+        seen = set()
+        for key in self._bands(signature):
+            for candidate in self.buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                other = self.texts[candidate]
+                # Filtre sur les longueurs : le ratio ne peut pas dépasser 2*min/(la+lb)
+                if 2 * min(len(text), len(other)) < self.threshold * (len(text) + len(other)):
+                    continue
+                matcher = SequenceMatcher(None, text, other)
+                if matcher.quick_ratio() >= self.threshold and matcher.ratio() >= self.threshold:
+                    return candidate
+        return None
+
+    def add(self, text: str, signature: np.ndarray) -> int:
+        index = len(self.texts)
+        self.texts.append(text)
+        for key in self._bands(signature):
+            self.buckets.setdefault(key, []).append(index)
+        return index
+
+
+def remove_duplicates(new_items: List[str], existing_items: List[str], threshold: float = 0.85) -> List[str]:
     """
     Supprime les doublons entre les nouveaux items et les items existants.
     
+    Un item est écarté s'il est similaire (voir is_similar) à un item déjà conservé,
+    en parcourant les nouveaux items puis les items existants. Les paires à comparer
+    sont présélectionnées par MinHash/LSH, ce qui rend le traitement quasi linéaire.
+    
     Args:
         new_items: Liste des nouveaux points de contrôle générés
         existing_items: Liste des points de contrôle existants
+        threshold: Seuil de similarité
         
     Returns:
-        Liste filtrée sans doublons
+        Liste filtrée sans doublons (nouveaux items conservés puis items existants conservés)
     """
     # On combine les listes pour éliminer les doublons internes aussi
     all_items = new_items + existing_items
-    unique_items = []
+    index = NearDuplicateIndex(threshold)
+    keep = []
     
     for item in all_items:
-        if not any(is_similar(item, existing) for existing in unique_items):
-            unique_items.append(item)
+        lowered = item.lower()
+        signature = _minhash_signature(lowered)
+        if index.find_similar(lowered, signature) is None:
+            index.add(lowered, signature)
+            keep.append(True)
+        else:
+            keep.append(False)
     
-    # On conserve l'ordre original pour les nouveaux items
-    return [item for item in new_items if item in unique_items] + \
-           [item for item in existing_items if item in unique_items]
\ No newline at end of file
+    # On conserve l'ordre original : nouveaux items puis items existants
+    return [item for item, kept in zip(all_items, keep) if kept]
+
+
+# Déduplication sémantique : modèle spaCy avec vecteurs de mots (sinon, vecteurs contextuels du modèle sm)
+DEFAULT_SEMANTIC_THRESHOLD = 0.95
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Plongements normalisés (norme 1) des textes ; un texte sans vecteur donne un vecteur nul."""
+    model = get_semantic_model()
+    vectors = np.array([doc.vector for doc in model.pipe(texts, batch_size=64)], dtype=np.float32)
+    if vectors.ndim != 2:
+        return np.zeros((len(texts), 0), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class SemanticIndex:
+    """
+    Index vectoriel des représentants de groupes de textes sémantiquement proches.
+
+    Chaque texte ajouté est comparé (similarité cosinus) aux représentants déjà
+    indexés : au-delà du seuil, il rejoint le groupe du plus proche ; sinon il
+    devient le représentant d'un nouveau groupe. L'index peut être alimenté par
+    plusieurs threads.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_SEMANTIC_THRESHOLD):
+        self.threshold = threshold
+        self.representatives: List[str] = []
+        self.clusters: List[List[str]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _append(self, vector: np.ndarray) -> None:
+        # Tableau agrandi par doublement pour éviter une copie à chaque ajout
+        if self._matrix is None:
+            self._matrix = np.zeros((16, vector.shape[0]), dtype=np.float32)
+        elif self._size == self._matrix.shape[0]:
+            self._matrix = np.vstack([self._matrix, np.zeros_like(self._matrix)])
+        self._matrix[self._size] = vector
+        self._size += 1
+
+    def _insert(self, texts: List[str]) -> List[Tuple[int, bool]]:
+        """Ajoute des textes ; retourne pour chacun (numéro de groupe, groupe créé par ce texte)."""
+        if not texts:
+            return []
+        vectors = embed_texts(texts)
+        placements = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                group = None
+                if self._size and vector.any():
+                    similarities = self._matrix[:self._size] @ vector
+                    best = int(similarities.argmax())
+                    if similarities[best] >= self.threshold:
+                        group = best
+                created = group is None
+                if created:
+                    group = len(self.representatives)
+                    self.representatives.append(text)
+                    self.clusters.append([])
+                    self._append(vector)
+                self.clusters[group].append(text)
+                placements.append((group, created))
+        return placements
+
+    def add(self, texts: List[str]) -> List[int]:
+        """Ajoute des textes ; retourne pour chacun le numéro de son groupe."""
+        return [group for group, _ in self._insert(texts)]
+
+    def filter_new(self, texts: List[str]) -> List[str]:
+        """Ajoute des textes et ne retourne que ceux qui ouvrent un nouveau groupe."""
+        return [text for text, (_, created) in zip(texts, self._insert(texts)) if created]
+
+
+def semantic_deduplicate(items: List[str], threshold: float = DEFAULT_SEMANTIC_THRESHOLD) -> Tuple[List[str], List[List[str]]]:
+    """
+    Regroupe les items sémantiquement équivalents (paraphrases comprises).
+
+    Args:
+        items: Règles ou points de contrôle
+        threshold: Similarité cosinus minimale pour rejoindre un groupe
+
+    Returns:
+        (un représentant par groupe, dans l'ordre d'apparition ; groupes complets)
+    """
+    index = SemanticIndex(threshold)
+    index.add(items)
+    return index.representatives, index.clusters